@@ -1,18 +1,31 @@
 # main_application.py
 
+import atexit
 import os
+import queue
+import random
+import re
+import stat
 import sys
 import subprocess
 import time
 import json # Ensure this import is present
 import logging
-import uuid
+import threading
+from logging.handlers import QueueHandler, QueueListener
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import List, Optional
 from datetime import datetime, timezone, timedelta
+from email.utils import parsedate_to_datetime
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 # tenacity is recommended for robust retries as per plan.md, install with: pip install tenacity
 try:
-    from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type, retry_if_result
+    from tenacity import retry, wait_exponential, wait_fixed, stop_after_attempt, retry_if_exception_type, retry_if_result
     TENACITY_AVAILABLE = True
 except ImportError:
     TENACITY_AVAILABLE = False
@@ -21,182 +34,446 @@ except ImportError:
         def decorator(func):
             return func
         return decorator
-from azure.storage.blob import BlobServiceClient, BlobSasPermissions, generate_blob_sas
+# orjson is optional and only used to speed up JSON parsing, install with: pip install orjson
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+# ijson is optional; when installed, transcripts are stream-parsed to disk instead of loaded whole: pip install ijson
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+# msgspec is optional; when installed, full transcript downloads are decoded straight into typed structs: pip install msgspec
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+from azure.storage.blob import BlobServiceClient, BlobType, ContainerSasPermissions, ContentSettings, generate_container_sas
 from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError, HttpResponseError
 
 # --- Configuration & Setup ---
+# Nothing below runs at import time: main() calls setup_logging() and load_config() once, and the
+# resulting Config is passed to each helper instead of being read from module globals.
+
+@dataclass(frozen=True)
+class Config:
+    """Settings read from the environment (.env) by load_config()."""
+    # Azure Credentials
+    azure_storage_connection_string: str
+    azure_storage_input_container: str
+    azure_speech_api_key: str
+    azure_speech_region: str
+    # Local Paths
+    local_transcript_output_dir: str
+    # Timeouts & Polling
+    client_connection_timeout_seconds: int
+    client_read_timeout_seconds: int
+    polling_interval_seconds: int # Upper bound for the polling backoff
+    polling_initial_interval_seconds: int # First backoff delay
+    max_polling_wallclock_seconds: int
+    ffmpeg_timeout_seconds: int
+    ffprobe_timeout_seconds: int
+    # Concurrency
+    max_workers: int # Number of finished jobs downloaded/saved in parallel
+    max_conversion_workers: int # Number of FFmpeg conversions/uploads run in parallel
+    max_concurrent_jobs: int # Speech jobs allowed in flight at once (API quota)
+    ffmpeg_threads: int
+    blob_upload_concurrency: int # Parallel block uploads per blob
+    blob_block_size_bytes: int # Block size for chunked uploads
+    blob_single_put_size_bytes: int # Uploads larger than this are split into blocks
+    blob_connection_data_block_size: int # Socket read/write chunk size (SDK default is 4 KiB)
+    force_reprocess: bool # Re-run items even if their transcript already exists from a previous run
+    # Azure API Settings
+    api_version: str
+
+    @property
+    def speech_base_url(self):
+        """Azure Speech API base URL (Using v3.2 structure)."""
+        return f"https://{self.azure_speech_region}.api.cognitive.microsoft.com/speechtotext/{self.api_version}"
 
-# Load environment variables from .env file
-load_dotenv()
+    def speech_headers(self):
+        """Headers for Azure Speech API requests."""
+        return {
+            'Ocp-Apim-Subscription-Key': self.azure_speech_api_key,
+            'Content-Type': 'application/json'
+        }
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(module)s - %(message)s',
-    handlers=[
+def setup_logging():
+    """Configures logging: worker threads only enqueue records; a single QueueListener thread does the console/file I/O."""
+    log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(threadName)s - %(module)s - %(message)s')
+    log_handlers = [
         logging.StreamHandler(sys.stdout),
         logging.FileHandler("transcript_processing.log", encoding='utf-8') # Log to file
     ]
-)
-
-# --- Suppress verbose Azure SDK logging ---
-logging.getLogger('azure.storage.blob').setLevel(logging.WARNING)
-logging.getLogger('azure.core.pipeline.policies').setLevel(logging.WARNING)
-# Also suppress underlying urllib3 logs often used by requests/azure
-logging.getLogger('urllib3.connectionpool').setLevel(logging.WARNING)
-# --- End Suppress ---
-
-# Get configuration from environment variables with defaults
-# Azure Credentials
-AZURE_STORAGE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
-AZURE_STORAGE_INPUT_CONTAINER = os.getenv("AZURE_STORAGE_INPUT_CONTAINER", "mp3") # Defaulted based on testing
-AZURE_SPEECH_API_KEY = os.getenv("AZURE_SPEECH_API_KEY")
-AZURE_SPEECH_REGION = os.getenv("AZURE_SPEECH_REGION", "eastus") # Defaulted based on testing
-# Local Paths
-LOCAL_TEMP_AUDIO_DIR = os.getenv("LOCAL_TEMP_AUDIO_DIR", "./temp_audio/")
-LOCAL_TRANSCRIPT_OUTPUT_DIR = os.getenv("LOCAL_TRANSCRIPT_OUTPUT_DIR", "./transcripts/")
-# Timeouts & Polling
-# Use client-level timeouts based on testing
-CLIENT_CONNECTION_TIMEOUT_SECONDS = int(os.getenv("CLIENT_CONNECTION_TIMEOUT_SECONDS", 60))
-CLIENT_READ_TIMEOUT_SECONDS = int(os.getenv("CLIENT_READ_TIMEOUT_SECONDS", 1900)) # Increased based on testing
-POLLING_INTERVAL_SECONDS = int(os.getenv("POLLING_INTERVAL_SECONDS", 30))
-MAX_POLLING_ATTEMPTS = int(os.getenv("MAX_POLLING_ATTEMPTS", 120)) # Default: 1 hour timeout (30s * 120)
-FFMPEG_TIMEOUT_SECONDS = int(os.getenv("FFMPEG_TIMEOUT_SECONDS", 1800)) # 30 minutes for conversion
-# Azure API Settings
-API_VERSION = os.getenv("API_VERSION", "v3.2") # Using v3.2 as confirmed working via PS
-
-# Validate essential configuration
-if not all([AZURE_STORAGE_CONNECTION_STRING, AZURE_SPEECH_API_KEY, AZURE_SPEECH_REGION]):
-    logging.error("Missing essential Azure credentials in .env file (AZURE_STORAGE_CONNECTION_STRING, AZURE_SPEECH_API_KEY, AZURE_SPEECH_REGION). Exiting.")
-    sys.exit(1)
-
-# Azure Speech API constants (Using v3.2 structure)
-SPEECH_BASE_URL = f"https://{AZURE_SPEECH_REGION}.api.cognitive.microsoft.com/speechtotext/{API_VERSION}"
-SPEECH_HEADERS = {
-    'Ocp-Apim-Subscription-Key': AZURE_SPEECH_API_KEY,
-    'Content-Type': 'application/json'
-}
+    for handler in log_handlers:
+        handler.setFormatter(log_formatter)
+    log_queue = queue.Queue(-1)
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(QueueHandler(log_queue)) # No formatter here, the listener's handlers format each record
+    log_listener = QueueListener(log_queue, *log_handlers)
+    log_listener.start()
+    atexit.register(log_listener.stop) # Flushes queued records on normal exit and on sys.exit()
 
-# Create local directories if they don't exist
-try:
-    os.makedirs(LOCAL_TEMP_AUDIO_DIR, exist_ok=True)
-    os.makedirs(LOCAL_TRANSCRIPT_OUTPUT_DIR, exist_ok=True)
-except OSError as e:
-    logging.error(f"Error creating local directories: {e}")
-    sys.exit(1)
+    # --- Suppress verbose Azure SDK logging ---
+    logging.getLogger('azure.storage.blob').setLevel(logging.WARNING)
+    logging.getLogger('azure.core.pipeline.policies').setLevel(logging.WARNING)
+    # Also suppress underlying urllib3 logs often used by requests/azure
+    logging.getLogger('urllib3.connectionpool').setLevel(logging.WARNING)
+    # --- End Suppress ---
+
+def load_config():
+    """Loads the .env file, reads and validates the configuration, and creates the output directory."""
+    # Load environment variables from .env file
+    load_dotenv()
+
+    # Get configuration from environment variables with defaults
+    polling_interval_seconds = int(os.getenv("POLLING_INTERVAL_SECONDS", 30))
+    max_polling_attempts = int(os.getenv("MAX_POLLING_ATTEMPTS", 120)) # Only used to derive the default wall-clock budget below
+    max_workers = int(os.getenv("MAX_WORKERS", 8))
+    max_conversion_workers = int(os.getenv("MAX_CONVERSION_WORKERS", 2))
+    config = Config(
+        azure_storage_connection_string=os.getenv("AZURE_STORAGE_CONNECTION_STRING"),
+        azure_storage_input_container=os.getenv("AZURE_STORAGE_INPUT_CONTAINER", "mp3"), # Defaulted based on testing
+        azure_speech_api_key=os.getenv("AZURE_SPEECH_API_KEY"),
+        azure_speech_region=os.getenv("AZURE_SPEECH_REGION", "eastus"), # Defaulted based on testing
+        local_transcript_output_dir=os.getenv("LOCAL_TRANSCRIPT_OUTPUT_DIR", "./transcripts/"),
+        # Use client-level timeouts based on testing
+        client_connection_timeout_seconds=int(os.getenv("CLIENT_CONNECTION_TIMEOUT_SECONDS", 60)),
+        client_read_timeout_seconds=int(os.getenv("CLIENT_READ_TIMEOUT_SECONDS", 1900)), # Increased based on testing
+        polling_interval_seconds=polling_interval_seconds,
+        polling_initial_interval_seconds=int(os.getenv("POLLING_INITIAL_INTERVAL_SECONDS", 2)),
+        max_polling_wallclock_seconds=int(os.getenv("MAX_POLLING_WALLCLOCK_SECONDS", max_polling_attempts * polling_interval_seconds)), # Default: 1 hour timeout
+        ffmpeg_timeout_seconds=int(os.getenv("FFMPEG_TIMEOUT_SECONDS", 1800)), # 30 minutes for conversion
+        ffprobe_timeout_seconds=int(os.getenv("FFPROBE_TIMEOUT_SECONDS", 60)), # Codec probe before conversion
+        max_workers=max_workers,
+        max_conversion_workers=max_conversion_workers,
+        max_concurrent_jobs=int(os.getenv("MAX_CONCURRENT_JOBS", max_workers)),
+        # Split the CPU between parallel FFmpeg processes instead of letting each one use every core
+        ffmpeg_threads=int(os.getenv("FFMPEG_THREADS", max(1, (os.cpu_count() or 1) // max(1, max_conversion_workers)))),
+        blob_upload_concurrency=int(os.getenv("BLOB_UPLOAD_CONCURRENCY", 8)),
+        blob_block_size_bytes=int(os.getenv("BLOB_BLOCK_SIZE_BYTES", 8 * 1024 * 1024)),
+        blob_single_put_size_bytes=int(os.getenv("BLOB_SINGLE_PUT_SIZE_BYTES", 4 * 1024 * 1024)),
+        blob_connection_data_block_size=int(os.getenv("BLOB_CONNECTION_DATA_BLOCK_SIZE", 64 * 1024)),
+        force_reprocess=os.getenv("FORCE_REPROCESS", "").strip().lower() in ("1", "true", "yes"),
+        api_version=os.getenv("API_VERSION", "v3.2") # Using v3.2 as confirmed working via PS
+    )
+
+    # Validate essential configuration
+    if not all([config.azure_storage_connection_string, config.azure_speech_api_key, config.azure_speech_region]):
+        logging.error("Missing essential Azure credentials in .env file (AZURE_STORAGE_CONNECTION_STRING, AZURE_SPEECH_API_KEY, AZURE_SPEECH_REGION). Exiting.")
+        sys.exit(1)
+
+    # Create local output directory if it doesn't exist
+    try:
+        os.makedirs(config.local_transcript_output_dir, exist_ok=True)
+    except OSError as e:
+        logging.error(f"Error creating local directories: {e}")
+        sys.exit(1)
+    return config
+
+# --- Shared HTTP Session ---
+# One pooled session for all Speech API / SAS calls so TCP+TLS connections are reused across polls and workers.
+# main() mounts an adapter sized for the configured worker count via configure_http_session().
+http_session = requests.Session()
+
+def configure_http_session(config):
+    """Sizes the shared session's connection pool for the configured polling workers."""
+    # Retries are handled by api_retry_strategy below, so the adapter itself does not retry.
+    http_adapter = HTTPAdapter(pool_connections=8, pool_maxsize=max(10, config.max_workers * 2), max_retries=0)
+    http_session.mount("https://", http_adapter)
+    http_session.mount("http://", http_adapter)
 
 # --- Retry Strategy (Optional but Recommended) ---
-# Define retry strategy for API calls using tenacity if available
+# Define retry strategies for API calls using tenacity if available:
+# api_retry_strategy for one-shot calls (submit, file list, download), and a much lighter
+# api_poll_retry_strategy for status polls, since poll_jobs() already retries on its own backoff schedule
+# and a long retry there would hold up every other job polled by the same thread.
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504}) # HTTP statuses worth retrying
+_RETRY_EXCEPTIONS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError)
+
+def _log_api_retry(retry_state):
+    if not logging.getLogger().isEnabledFor(logging.WARNING):
+        return # Skip formatting the reason when warnings are suppressed
+    outcome = retry_state.outcome # A Future holding either the response or the raised exception
+    reason = type(outcome.exception()).__name__ if outcome.failed else getattr(outcome.result(), 'status_code', None)
+    logging.warning("Retrying API call due to %s. Attempt #%d. Waiting %.2fs...", reason, retry_state.attempt_number, retry_state.next_action.sleep)
+
 if TENACITY_AVAILABLE:
     api_retry_strategy = retry(
         wait=wait_exponential(multiplier=1, min=2, max=10), # Exponential backoff: 2s, 4s, 8s, 10s...
         stop=stop_after_attempt(5), # Max 5 attempts for API calls
         retry=(
-            retry_if_exception_type((requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError)) |
-            retry_if_result(lambda r: isinstance(r, requests.Response) and r.status_code in [429, 500, 502, 503, 504]) # Retry on specific HTTP errors
+            retry_if_exception_type(_RETRY_EXCEPTIONS) |
+            retry_if_result(lambda r: getattr(r, 'status_code', None) in _RETRY_STATUSES) # Retry on specific HTTP errors
         ),
-        before_sleep=lambda retry_state: logging.warning(f"Retrying API call due to {retry_state.outcome.status_code if isinstance(retry_state.outcome, requests.Response) else type(retry_state.outcome).__name__}. Attempt #{retry_state.attempt_number}. Waiting {retry_state.next_action.sleep:.2f}s...")
+        before_sleep=_log_api_retry
+    )
+    api_poll_retry_strategy = retry(
+        wait=wait_fixed(1),
+        stop=stop_after_attempt(2), # One quick retry for transient network errors; HTTP errors go straight back to the poller
+        retry=retry_if_exception_type(_RETRY_EXCEPTIONS),
+        before_sleep=_log_api_retry,
+        reraise=True # Hand the original RequestException to poll_job_once() so it reschedules the poll
     )
 else:
-    logging.warning("`tenacity` library not found. Proceeding without automatic API retries. Install with `pip install tenacity` for better robustness.")
+    # main() logs a warning about the missing library once logging is configured
     api_retry_strategy = retry() # Apply dummy decorator
+    api_poll_retry_strategy = retry()
 
 # --- Helper Functions ---
 
-def initialize_blob_service_client():
-    """Initializes BlobServiceClient with configured timeouts."""
-    logging.info(f"Initializing BlobServiceClient (Connect Timeout: {CLIENT_CONNECTION_TIMEOUT_SECONDS}s, Read Timeout: {CLIENT_READ_TIMEOUT_SECONDS}s)")
+# Unique IDs for blob and job names: a per-process prefix (PID + start time, so concurrent or
+# consecutive runs sharing the container don't collide) plus a counter, instead of a uuid4 per call
+_short_id_prefix = f"{os.getpid():x}-{int(time.time()):x}-"
+_short_id_counter = itertools.count()
+
+def short_id():
+    """Returns an ID unique to this process and call, for naming blobs and jobs."""
+    return f"{_short_id_prefix}{next(_short_id_counter):x}"
+
+def parse_json(raw):
+    """Parses a JSON document from bytes/str, using orjson when available."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+# Matches a still-pending job status in a raw status response; replies are only fully parsed once the job is done
+_PENDING_STATUS_RE = re.compile(rb'"status"\s*:\s*"(NotStarted|Running)"')
+
+def peek_pending_status(raw):
+    """Returns 'NotStarted'/'Running' if the raw job JSON says the job is still pending, else None."""
+    match = _PENDING_STATUS_RE.search(raw)
+    return match.group(1).decode('ascii') if match else None
+
+def dump_json(obj):
+    """Serializes obj to UTF-8 JSON bytes, using orjson when available."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+# Storage account SAS signing credentials, cached once by initialize_blob_service_client() rather than read off the client per blob
+STORAGE_ACCOUNT_NAME = None
+STORAGE_ACCOUNT_KEY = None
+
+def initialize_blob_service_client(config):
+    """Initializes BlobServiceClient with configured timeouts and caches its SAS signing credentials."""
+    global STORAGE_ACCOUNT_NAME, STORAGE_ACCOUNT_KEY
+    logging.info(f"Initializing BlobServiceClient (Connect Timeout: {config.client_connection_timeout_seconds}s, Read Timeout: {config.client_read_timeout_seconds}s)")
     try:
         client = BlobServiceClient.from_connection_string(
-            AZURE_STORAGE_CONNECTION_STRING,
-            connection_timeout=CLIENT_CONNECTION_TIMEOUT_SECONDS,
-            read_timeout=CLIENT_READ_TIMEOUT_SECONDS
+            config.azure_storage_connection_string,
+            connection_timeout=config.client_connection_timeout_seconds,
+            read_timeout=config.client_read_timeout_seconds,
+            max_block_size=config.blob_block_size_bytes,
+            max_single_put_size=config.blob_single_put_size_bytes,
+            connection_data_block_size=config.blob_connection_data_block_size
         )
+        STORAGE_ACCOUNT_NAME = client.account_name
+        STORAGE_ACCOUNT_KEY = client.credential.account_key
         logging.info("BlobServiceClient initialized.")
         return client
     except Exception as e:
         logging.error(f"Failed to initialize Azure Blob Service Client: {e}")
         raise
 
-def convert_m3u8_to_mp3(m3u8_url, output_mp3_path):
-    """Converts M3U8 stream to MP3 using FFmpeg."""
-    logging.info(f"Attempting FFmpeg conversion: {m3u8_url} -> {output_mp3_path}")
+FFMPEG_PROTOCOL_WHITELIST = 'file,http,https,tcp,tls,crypto'
+FFMPEG_PIPE_BUFFER_BYTES = 4 * 1024 * 1024 # Large read buffer on FFmpeg's stdout so block-sized reads need few syscalls
+FFMPEG_STDERR_TAIL_LINES = 50 # FFmpeg stderr lines kept in memory for the error message if the conversion fails
+MIN_AUDIO_BYTES = 1024 # Converted audio smaller than this is treated as a failed conversion (e.g. the HLS source dropped)
+
+def probe_audio_codec(config, m3u8_url):
+    """Returns the codec name of the stream's first audio track via ffprobe, or None if it can't be determined."""
+    command = [
+        'ffprobe',
+        '-protocol_whitelist', FFMPEG_PROTOCOL_WHITELIST,
+        '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'stream=codec_name',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        m3u8_url
+    ]
+    try:
+        result = subprocess.run(command, check=True, capture_output=True, text=True, timeout=config.ffprobe_timeout_seconds)
+        codec_name = result.stdout.strip().splitlines()[0] if result.stdout.strip() else None
+        logging.info(f"ffprobe detected audio codec '{codec_name}' for {m3u8_url}")
+        return codec_name
+    except FileNotFoundError:
+        logging.warning("ffprobe command not found. Falling back to MP3 re-encoding.")
+    except subprocess.CalledProcessError as e:
+        logging.warning(f"ffprobe failed for {m3u8_url} (Return code: {e.returncode}). Falling back to MP3 re-encoding. Stderr: {e.stderr.strip()}")
+    except subprocess.TimeoutExpired:
+        logging.warning(f"ffprobe timed out after {config.ffprobe_timeout_seconds} seconds for {m3u8_url}. Falling back to MP3 re-encoding.")
+    except Exception as e:
+        logging.warning(f"Unexpected error during ffprobe for {m3u8_url}: {e}. Falling back to MP3 re-encoding.")
+    return None
+
+# Output formats keyed by source audio codec. Codecs Azure Speech accepts as-is are stream-copied into a
+# pipe-friendly container; anything else is re-encoded to MP3.
+# Values: (FFmpeg codec args, FFmpeg muxer, blob file extension, blob Content-Type)
+STREAM_COPY_FORMATS = {
+    'mp3': (['-c:a', 'copy'], 'mp3', '.mp3', 'audio/mpeg'),
+    'aac': (['-c:a', 'copy'], 'adts', '.aac', 'audio/aac'),
+}
+MP3_REENCODE_FORMAT = (['-acodec', 'mp3', '-ab', '128k'], 'mp3', '.mp3', 'audio/mpeg')
+
+def choose_output_format(config, m3u8_url):
+    """Probes the source and returns the output format tuple to use for it (see STREAM_COPY_FORMATS)."""
+    return STREAM_COPY_FORMATS.get(probe_audio_codec(config, m3u8_url), MP3_REENCODE_FORMAT)
+
+class AudioTooSmallError(RuntimeError):
+    """Raised when FFmpeg's output ends before MIN_AUDIO_BYTES were produced."""
+
+class MinimumSizeReader:
+    """Wraps FFmpeg's stdout for upload_blob(), counting the bytes read.
+
+    Raises AudioTooSmallError at end of stream if fewer than min_bytes arrived, which aborts the upload
+    before its block list is committed, so no Speech job is ever submitted for an empty or truncated file.
+    """
+    def __init__(self, raw, min_bytes):
+        self._raw = raw
+        self._min_bytes = min_bytes
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self._raw.read(size)
+        self.bytes_read += len(data)
+        if not data and self.bytes_read < self._min_bytes:
+            raise AudioTooSmallError(f"FFmpeg produced only {self.bytes_read} bytes (minimum {self._min_bytes})")
+        return data
+
+def convert_and_upload(config, m3u8_url, blob_client, output_format=MP3_REENCODE_FORMAT):
+    """Converts M3U8 stream with FFmpeg and streams FFmpeg's stdout straight into Azure Blob Storage.
+
+    output_format comes from choose_output_format(), so compatible sources are stream-copied instead of re-encoded.
+    """
+    blob_name_in_azure = blob_client.blob_name
+    codec_args, muxer, _, content_type = output_format
+    logging.info("Streaming FFmpeg conversion (%s) of %s to container '%s' as blob '%s'...", ' '.join(codec_args), m3u8_url, config.azure_storage_input_container, blob_name_in_azure)
+    # Let FFmpeg retry dropped HTTP connections itself instead of failing the whole conversion
+    reconnect_args = ['-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5'] if m3u8_url.startswith(('http://', 'https://')) else []
     command = [
         'ffmpeg',
-        '-protocol_whitelist', 'file,http,https,tcp,tls,crypto',
+        '-protocol_whitelist', FFMPEG_PROTOCOL_WHITELIST,
+        *reconnect_args,
         '-i', m3u8_url,
-        '-acodec', 'mp3', '-ab', '128k',
-        '-vn', '-y',
+        *codec_args,
+        '-vn', '-sn', '-dn',
+        '-threads', str(config.ffmpeg_threads),
         '-loglevel', 'error',
-        output_mp3_path
+        '-f', muxer, 'pipe:1'
     ]
     try:
-        result = subprocess.run(command, check=True, capture_output=True, text=True, timeout=FFMPEG_TIMEOUT_SECONDS)
-        logging.info(f"FFmpeg conversion successful for {m3u8_url}")
-        return True
-    except subprocess.CalledProcessError as e:
-        logging.error(f"FFmpeg failed for {m3u8_url}. Return code: {e.returncode}. Stderr: {e.stderr.strip()}")
-        return False
-    except subprocess.TimeoutExpired:
-        logging.error(f"FFmpeg timed out after {FFMPEG_TIMEOUT_SECONDS} seconds for {m3u8_url}")
-        return False
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=FFMPEG_PIPE_BUFFER_BYTES)
     except FileNotFoundError:
         logging.error("FFmpeg command not found. Please ensure FFmpeg is installed and in system PATH.")
         return False
     except Exception as e:
-        logging.error(f"Unexpected error during FFmpeg conversion for {m3u8_url}: {e}")
+        logging.error("Failed to start FFmpeg for %s: %s", m3u8_url, e)
         return False
 
-def upload_blob(local_path, blob_name_in_azure, service_client):
-    """Uploads a local file to Azure Blob Storage using the provided client."""
-    logging.info(f"Uploading '{local_path}' to container '{AZURE_STORAGE_INPUT_CONTAINER}' as blob '{blob_name_in_azure}'...")
-    if not os.path.exists(local_path):
-        logging.error(f"Local file not found for upload: {local_path}")
-        return False
+    # Drain stderr in the background so FFmpeg never blocks on a full pipe while we consume stdout.
+    # Lines go to the debug log as they arrive; only the last few are kept for the failure message.
+    stderr_tail = deque(maxlen=FFMPEG_STDERR_TAIL_LINES)
+    def _drain_stderr():
+        for raw_line in proc.stderr:
+            if line := raw_line.decode('utf-8', errors='replace').rstrip():
+                logging.debug("ffmpeg: %s", line)
+                stderr_tail.append(line)
+    stderr_thread = threading.Thread(target=_drain_stderr, daemon=True)
+    stderr_thread.start()
+    # Enforce the FFmpeg timeout on the whole conversion+upload, as subprocess.run(timeout=) did before
+    timed_out = threading.Event()
+    def _kill_on_timeout():
+        timed_out.set()
+        proc.kill()
+    watchdog = threading.Timer(config.ffmpeg_timeout_seconds, _kill_on_timeout)
+    watchdog.daemon = True
+    watchdog.start()
+
+    upload_ok = False; audio_too_small = False
+    audio_stream = MinimumSizeReader(proc.stdout, MIN_AUDIO_BYTES)
     try:
-        blob_client = service_client.get_blob_client(container=AZURE_STORAGE_INPUT_CONTAINER, blob=blob_name_in_azure)
-        with open(local_path, "rb") as data:
-            blob_client.upload_blob(data, overwrite=True)
-        logging.info(f"Upload successful for blob '{blob_name_in_azure}'.")
-        return True
+        blob_client.upload_blob(audio_stream, blob_type=BlobType.BLOCKBLOB, overwrite=True, max_concurrency=config.blob_upload_concurrency,
+                                content_settings=ContentSettings(content_type=content_type))
+        upload_ok = True
+    except AudioTooSmallError as e:
+        audio_too_small = True; too_small_message = str(e)
     except HttpResponseError as e:
-        logging.error(f"Azure HTTP error during upload of '{blob_name_in_azure}': {e.message}")
-        return False
+        logging.error("Azure HTTP error during upload of '%s': %s", blob_name_in_azure, e.message)
     except Exception as e:
         err_str = str(e).lower()
         if "timeout" in err_str or "timed out" in err_str:
-             logging.error(f"Upload operation timed out for '{blob_name_in_azure}' (Client Read Timeout: {CLIENT_READ_TIMEOUT_SECONDS}s).")
+             logging.error("Upload operation timed out for '%s' (Client Read Timeout: %ss).", blob_name_in_azure, config.client_read_timeout_seconds)
         else:
-             logging.error(f"Unexpected error during upload of '{blob_name_in_azure}': {e}")
+             logging.error("Unexpected error during upload of '%s': %s", blob_name_in_azure, e)
+    finally:
+        # No point converting further if the upload is gone. A too-small stream already reached EOF, so let
+        # FFmpeg exit on its own and report its real return code (the watchdog still bounds the wait)
+        if not upload_ok and not audio_too_small and proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        returncode = proc.wait()
+        watchdog.cancel()
+        stderr_thread.join(timeout=5)
+
+    if timed_out.is_set():
+        logging.error("FFmpeg timed out after %s seconds for %s", config.ffmpeg_timeout_seconds, m3u8_url)
         return False
+    if not upload_ok and not audio_too_small:
+        return False
+    if returncode != 0:
+        stderr_text = '\n'.join(stderr_tail)
+        logging.error("FFmpeg failed for %s. Return code: %s. Stderr: %s", m3u8_url, returncode, stderr_text)
+        return False
+    if audio_too_small:
+        logging.error("%s for %s. Not submitting blob '%s' for transcription.", too_small_message, m3u8_url, blob_name_in_azure)
+        return False
+    logging.info("FFmpeg conversion and upload successful for blob '%s' (%d bytes).", blob_name_in_azure, audio_stream.bytes_read)
+    return True
 
-def get_blob_sas_uri(blob_name_in_azure, service_client):
-    """Generates a read-only SAS URI for a blob."""
-    logging.info(f"Generating SAS URI for blob '{blob_name_in_azure}'...")
-    try:
-        sas_token = generate_blob_sas(
-            account_name=service_client.account_name,
-            container_name=AZURE_STORAGE_INPUT_CONTAINER,
-            blob_name=blob_name_in_azure,
-            account_key=service_client.credential.account_key,
-            permission=BlobSasPermissions(read=True),
-            expiry=datetime.now(timezone.utc) + timedelta(hours=3) # Extend expiry slightly
-        )
-        sas_uri = f"https://{service_client.account_name}.blob.core.windows.net/{AZURE_STORAGE_INPUT_CONTAINER}/{blob_name_in_azure}?{sas_token}"
-        logging.info(f"SAS URI generated successfully for '{blob_name_in_azure}'.")
-        return sas_uri
-    except Exception as e:
-        logging.error(f"Failed to generate SAS URI for '{blob_name_in_azure}': {e}")
-        return None
+# One read-only container SAS is shared by every blob in the batch. It is reissued only when less
+# than CONTAINER_SAS_MIN_REMAINING is left, so each submitted job keeps at least that long to read its audio.
+CONTAINER_SAS_VALIDITY = timedelta(hours=6)
+CONTAINER_SAS_MIN_REMAINING = timedelta(hours=3)
+_container_sas_lock = threading.Lock()
+_container_sas = {'token': None, 'expiry': None}
 
-def delete_blob(blob_name_in_azure, service_client):
+def get_container_sas_token(config):
+    """Returns the shared read-only SAS token for the input container, generating it if needed."""
+    with _container_sas_lock:
+        now = datetime.now(timezone.utc)
+        if _container_sas['token'] and _container_sas['expiry'] - now > CONTAINER_SAS_MIN_REMAINING:
+            return _container_sas['token']
+        logging.info("Generating container SAS token for '%s'...", config.azure_storage_input_container)
+        try:
+            expiry = now + CONTAINER_SAS_VALIDITY
+            _container_sas['token'] = generate_container_sas(
+                account_name=STORAGE_ACCOUNT_NAME,
+                container_name=config.azure_storage_input_container,
+                account_key=STORAGE_ACCOUNT_KEY,
+                permission=ContainerSasPermissions(read=True),
+                expiry=expiry
+            )
+            _container_sas['expiry'] = expiry
+            logging.info("Container SAS token generated successfully (expires %s).", expiry.isoformat())
+            return _container_sas['token']
+        except Exception as e:
+            logging.error("Failed to generate container SAS token for '%s': %s", config.azure_storage_input_container, e)
+            return None
+
+def delete_blob(blob_client):
     """Deletes a blob from Azure Blob Storage."""
-    logging.info(f"Attempting cleanup: Deleting blob '{blob_name_in_azure}'...")
-    if not blob_name_in_azure:
-        logging.warning("Skipping blob deletion, blob name not provided.")
+    if blob_client is None:
+        logging.warning("Skipping blob deletion, blob client not provided.")
         return False
+    blob_name_in_azure = blob_client.blob_name
+    logging.info(f"Attempting cleanup: Deleting blob '{blob_name_in_azure}'...")
     try:
-        blob_client = service_client.get_blob_client(container=AZURE_STORAGE_INPUT_CONTAINER, blob=blob_name_in_azure)
         blob_client.delete_blob(delete_snapshots="include")
         logging.info(f"Blob '{blob_name_in_azure}' deleted successfully.")
         return True
@@ -211,9 +488,8 @@ def delete_blob(blob_name_in_azure, service_client):
         return False
 
 # --- MODIFIED _make_speech_api_request ---
-@api_retry_strategy
-def _make_speech_api_request(method, url, headers=None, json_payload=None, data=None, timeout=60):
-    """Internal helper to make requests with retry, handling both json and data."""
+def _send_speech_api_request(method, url, headers=None, json_payload=None, data=None, timeout=60, stream=False):
+    """Internal helper to make requests, handling both json and data. Wrapped with a retry policy below."""
     # Log details before making the request
     # logging.info(f"Making request: {method} {url}")
     # logging.info(f"Request Headers: {headers}")
@@ -223,17 +499,20 @@ def _make_speech_api_request(method, url, headers=None, json_payload=None, data=
     #      logging.info(f"Request Data Payload (via data=): {data}")
 
     # Make the request, passing both json and data allows requests to pick correctly
-    response = requests.request(method, url, headers=headers, json=json_payload, data=data, timeout=timeout)
+    response = http_session.request(method, url, headers=headers, json=json_payload, data=data, timeout=timeout, stream=stream)
 
     response.raise_for_status() # Raise HTTPError for 4xx/5xx, triggering retry if applicable
     return response
 
+_make_speech_api_request = api_retry_strategy(_send_speech_api_request)
+_make_speech_poll_request = api_poll_retry_strategy(_send_speech_api_request) # Used by poll_job_once()
+
 # --- MODIFIED submit_transcription_job ---
-def submit_transcription_job(sas_uri, job_base_name):
+def submit_transcription_job(config, sas_uri, job_base_name):
     """Submits a transcription job to Azure Speech API using explicit JSON string."""
     logging.info(f"Submitting transcription job '{job_base_name}'...")
-    job_display_name = f"{job_base_name}_{uuid.uuid4().hex[:8]}"
-    endpoint_url = f"{SPEECH_BASE_URL}/transcriptions" # Using v3.2 endpoint structure
+    job_display_name = f"{job_base_name}_{short_id()}"
+    endpoint_url = f"{config.speech_base_url}/transcriptions" # Using v3.2 endpoint structure
 
     # Define the payload as a Python dictionary
     payload = {
@@ -251,13 +530,15 @@ def submit_transcription_job(sas_uri, job_base_name):
 
     try:
         # --- Explicitly convert the dictionary to a JSON string ---
-        payload_str = json.dumps(payload)
+        payload_str = dump_json(payload)
         # logging.info(f"Sending JSON string: {payload_str}") # Log JSON string
 
         # --- Call the internal request function using data=payload_str ---
-        response = _make_speech_api_request("POST", endpoint_url, headers=SPEECH_HEADERS, data=payload_str)
+        response = _make_speech_api_request("POST", endpoint_url, headers=config.speech_headers(), data=payload_str)
 
-        response_data = response.json()
+        response_data = parse_json(response.content)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("Submit response for '%s': %s", job_base_name, response.content.decode('utf-8', errors='replace'))
         job_url = response_data.get('self')
         if not job_url:
             logging.error(f"Azure Speech API did not return a 'self' URL. Response: {response_data}")
@@ -274,98 +555,260 @@ def submit_transcription_job(sas_uri, job_base_name):
          logging.error(f"Unexpected error submitting job '{job_base_name}': {e}")
          return None
 
-def poll_job_status(job_url):
-    """Polls the job status URL until completion or timeout."""
-    logging.info(f"Polling job status every {POLLING_INTERVAL_SECONDS}s (Max {MAX_POLLING_ATTEMPTS} attempts): {job_url}")
-    job_data = None; final_status = None; attempts = 0
-    while attempts < MAX_POLLING_ATTEMPTS:
-        attempts += 1
-        job_id_short = job_url.split('/')[-1] # For cleaner logging
-        # logging.info(f"Polling attempt {attempts}/{MAX_POLLING_ATTEMPTS} for job {job_id_short}...")
-        try:
-            if attempts > 1: time.sleep(POLLING_INTERVAL_SECONDS)
-            response = _make_speech_api_request("GET", job_url, headers=SPEECH_HEADERS, timeout=30)
-            job_data = response.json(); current_status = job_data.get('status')
-            # logging.info(f"  Job status: {current_status}")
-            if current_status in ['Succeeded', 'Failed']:
-                final_status = current_status; break
-        except requests.exceptions.RequestException as e:
-            logging.warning(f"Polling attempt {attempts} failed for job {job_id_short}: {e}")
-            if e.response is not None and e.response.status_code == 404:
-                 logging.error(f"Job URL {job_url} not found (404) during polling. Stopping poll."); final_status = 'NotFound'; break
-            if attempts >= MAX_POLLING_ATTEMPTS: final_status = 'PollingError'; break # Stop if max attempts reached after error
-        except Exception as e:
-            logging.error(f"Unexpected polling error for job {job_id_short}: {e}. Stopping poll."); final_status = 'PollingError'; break
+def _get_retry_after_seconds(response):
+    """Returns the server's Retry-After hint in seconds, or None if absent/unparseable."""
+    if response is None: return None
+    retry_after = response.headers.get('Retry-After')
+    if not retry_after: return None
+    retry_after = retry_after.strip()
+    if retry_after.isdigit():
+        return int(retry_after)
+    try: # Retry-After may also be an HTTP-date
+        retry_at = parsedate_to_datetime(retry_after)
+        return max(0, int((retry_at - datetime.now(timezone.utc)).total_seconds()))
+    except (TypeError, ValueError):
+        return None
+
+POLLING_JITTER = 0.2 # Backoff delays are randomized by +/-20%
+
+@dataclass
+class PolledJob:
+    """Polling state of one submitted transcription job, owned by the poll_jobs() thread."""
+    output_base_filename: str
+    blob_client: object
+    job_url: str
+    job_id_short: str # For cleaner logging
+    deadline: float # time.monotonic() after which polling gives up
+    backoff: float
+    next_poll_at: float = 0.0
+    attempts: int = 0
 
-    if final_status not in ['Succeeded', 'Failed', 'NotFound', 'PollingError']:
-        logging.warning(f"Polling stopped after {max_polling_attempts} attempts for job {job_id_short}. Job may still be running.")
-        final_status = 'Timeout'
+def poll_job_once(config, job, speech_headers):
+    """Issues one status GET for job and schedules its next poll.
+
+    Waits between polls grow exponentially from config.polling_initial_interval_seconds up to
+    config.polling_interval_seconds, unless the server's Retry-After hint says otherwise. Each wait is
+    jittered by up to POLLING_JITTER so jobs submitted together don't stay in lock-step. Polling
+    gives up once config.max_polling_wallclock_seconds have elapsed.
+    Returns (final_status, job_data); final_status is None while the job should be polled again.
+    """
+    job.attempts += 1
+    logging.debug("Polling attempt %d for job %s...", job.attempts, job.job_id_short)
+    if job.attempts > 1:
+        job.backoff = min(job.backoff * 1.5, config.polling_interval_seconds)
+    next_delay = job.backoff * random.uniform(1 - POLLING_JITTER, 1 + POLLING_JITTER)
+    job_data = None; final_status = None; failed = False
+    try:
+        response = _make_speech_poll_request("GET", job.job_url, headers=speech_headers, timeout=30)
+        retry_after = _get_retry_after_seconds(response)
+        if retry_after is not None: next_delay = retry_after
+        current_status = peek_pending_status(response.content)
+        if current_status is None: # Terminal or unexpected status: parse the whole body, save_item() needs it
+            job_data = parse_json(response.content); current_status = job_data.get('status')
+        logging.debug("  Job %s status: %s", job.job_id_short, current_status)
+        if current_status in ['Succeeded', 'Failed']:
+            logging.info("Job %s finished with status '%s' after %d polling attempts.", job.job_id_short, current_status, job.attempts)
+            logging.debug("Final job data for %s: %s", job.job_id_short, job_data)
+            return current_status, job_data
+    except requests.exceptions.RequestException as e:
+        logging.warning("Polling attempt %d failed for job %s: %s", job.attempts, job.job_id_short, e)
+        retry_after = _get_retry_after_seconds(e.response)
+        if retry_after is not None: next_delay = retry_after
+        if e.response is not None and e.response.status_code == 404:
+             logging.error("Job URL %s not found (404) during polling. Stopping poll.", job.job_url); return 'NotFound', None
+        failed = True
+    except Exception as e:
+        logging.error("Unexpected polling error for job %s: %s. Stopping poll.", job.job_id_short, e); return 'PollingError', None
+
+    now = time.monotonic()
+    if now >= job.deadline:
+        if failed: return 'PollingError', job_data # Stop if the polling budget ran out after an error
+        logging.warning("Polling stopped after %ds (%d attempts) for job %s. Job may still be running.", config.max_polling_wallclock_seconds, job.attempts, job.job_id_short)
+        return 'Timeout', job_data
+    job.next_poll_at = min(now + next_delay, job.deadline)
     return final_status, job_data
 
-def download_transcript_content(job_data):
-    """Downloads the transcript JSON content if job succeeded."""
-    logging.info("Attempting to download transcript content...")
+def poll_jobs(config, new_jobs, on_job_done):
+    """Polls every outstanding transcription job from a single thread.
+
+    Reads (output_base_filename, blob_client, job_url) tuples from the new_jobs queue until a None
+    sentinel arrives, issues each job's status GET when it is due, and calls
+    on_job_done(job, final_status, job_data) once a job reaches a final state.
+    """
+    speech_headers = config.speech_headers()
+    outstanding = []; no_more_jobs = False
+    while outstanding or not no_more_jobs:
+        wait = max(0, min(job.next_poll_at for job in outstanding) - time.monotonic()) if outstanding else None
+        if not no_more_jobs:
+            try:
+                new_job = new_jobs.get(timeout=wait) # Wakes up for new submissions while waiting for the next due poll
+                if new_job is None:
+                    no_more_jobs = True
+                else:
+                    output_base_filename, blob_client, job_url = new_job
+                    logging.info("Polling job status with backoff %ss-%ss (Max %ds): %s", config.polling_initial_interval_seconds, config.polling_interval_seconds, config.max_polling_wallclock_seconds, job_url)
+                    outstanding.append(PolledJob(
+                        output_base_filename, blob_client, job_url, job_url.rsplit('/', 1)[-1],
+                        deadline=time.monotonic() + config.max_polling_wallclock_seconds,
+                        backoff=min(config.polling_initial_interval_seconds, config.polling_interval_seconds)
+                    ))
+                continue
+            except queue.Empty:
+                pass
+        elif wait:
+            time.sleep(wait)
+
+        now = time.monotonic()
+        for job in [job for job in outstanding if job.next_poll_at <= now]:
+            final_status, job_data = poll_job_once(config, job, speech_headers)
+            if final_status is not None:
+                outstanding.remove(job)
+                on_job_done(job, final_status, job_data)
+
+def get_transcript_content_url(config, job_data):
+    """Returns the SAS content URL of the job's transcription result file, or None."""
     if not job_data: logging.error("No job data available for download."); return None
     files_url = job_data.get('links', {}).get('files')
     if not files_url: logging.error(f"No 'files' link in job data: {job_data}"); return None
 
     try:
         logging.info(f"Getting file list from files URL: {files_url}");
-        files_response = _make_speech_api_request("GET", files_url, headers=SPEECH_HEADERS, timeout=30)
-        files_data = files_response.json()
+        files_response = _make_speech_api_request("GET", files_url, headers=config.speech_headers(), timeout=30)
+        files_data = parse_json(files_response.content)
 
-        transcript_content_url = next((f.get('links', {}).get('contentUrl') for f in files_data.get('values', []) if f.get('kind') == 'Transcription'), None)
+        transcript_content_url = None
+        for f in files_data.get('values', ()):
+            if f.get('kind') == 'Transcription':
+                transcript_content_url = (f.get('links') or {}).get('contentUrl')
+                break
         if not transcript_content_url: logging.error(f"Transcript 'contentUrl' not found in files list: {files_data}"); return None
+        return transcript_content_url
 
-        logging.info(f"Downloading transcript content from SAS URL: {transcript_content_url[:100]}..."); # Log start of URL only
-
-        # Use simple requests.get for SAS URL, apply retry logic
-        @api_retry_strategy
-        def download_sas_content(url):
-             # Use the internal helper which has logging and error handling
-             response = _make_speech_api_request("GET", url, timeout=120) # Longer timeout for potential large transcript
-             return response.json()
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Failed to get transcript file list after retries: {e}")
+        if e.response is not None: logging.error(f"Final status code: {e.response.status_code}, Response body: {e.response.text}")
+        return None
+    except Exception as e:
+        logging.error(f"Unexpected error getting transcript file list: {e}"); return None
 
-        transcript_json = download_sas_content(transcript_content_url)
+def download_transcript_content(transcript_content_url):
+    """Downloads the whole transcript JSON document and returns its raw bytes (parsed by save_transcript_to_file)."""
+    logging.info(f"Downloading transcript content from SAS URL: {transcript_content_url[:100]}..."); # Log start of URL only
+    try:
+        # _make_speech_api_request already applies api_retry_strategy, so no extra retry wrapper here
+        response = _make_speech_api_request("GET", transcript_content_url, timeout=120) # Longer timeout for potential large transcript
+        transcript_json = response.content
         logging.info("Transcript content downloaded successfully.")
         return transcript_json
 
     except requests.exceptions.RequestException as e:
-        logging.error(f"Failed to download transcript files/content after retries: {e}")
+        logging.error(f"Failed to download transcript content after retries: {e}")
         if e.response is not None: logging.error(f"Final status code: {e.response.status_code}, Response body: {e.response.text}")
         return None
     except Exception as e:
         logging.error(f"Unexpected error during transcript download: {e}"); return None
 
+# Transcripts are written to '<path>.tmp' and renamed into place with os.replace(), so an interrupted
+# write never leaves a partial .txt that the resume check would mistake for a finished item
+TMP_SUFFIX = ".tmp"
+
+def stream_transcript_to_file(transcript_content_url, output_file_path):
+    """Stream-parses the transcript with ijson, writing phrase text to disk as it arrives.
+
+    Returns True if any text was written. Returns False otherwise (including on errors), leaving no output file,
+    so the caller can fall back to a full download to try 'displayText' and save the raw JSON for debugging.
+    """
+    logging.info(f"Streaming transcript content from SAS URL: {transcript_content_url[:100]}..."); # Log start of URL only
+    tmp_path = output_file_path + TMP_SUFFIX
+    try:
+        response = _make_speech_api_request("GET", transcript_content_url, timeout=120, stream=True)
+        with response, open(tmp_path, 'w', encoding='utf-8') as f:
+            response.raw.decode_content = True # Let urllib3 undo any gzip/deflate transfer encoding
+            chars_written = write_lexical_text(ijson.items(response.raw, 'combinedRecognizedPhrases.item.lexical'), f)
+    except Exception as e:
+        logging.warning(f"Streaming transcript parse failed ({e}). Falling back to full download.")
+        chars_written = 0
+
+    if chars_written:
+        os.replace(tmp_path, output_file_path)
+        logging.info(f"Extracted text length: {chars_written} characters.")
+        logging.info(f"Transcript successfully saved to {output_file_path}")
+        return True
+    if os.path.exists(tmp_path): os.remove(tmp_path)
+    return False
+
+def retrieve_transcript_to_file(config, job_data, output_file_path):
+    """Downloads the transcript of a succeeded job and saves its text. Returns True on success."""
+    logging.info("Attempting to download transcript content...")
+    transcript_content_url = get_transcript_content_url(config, job_data)
+    if not transcript_content_url:
+        return False
+    # Constant-memory path when ijson is installed; the full parse is still needed for the displayText fallback
+    if IJSON_AVAILABLE and stream_transcript_to_file(transcript_content_url, output_file_path):
+        return True
+    transcript_content = download_transcript_content(transcript_content_url)
+    if not transcript_content:
+        logging.error("Failed to download transcript content after job success.")
+        return False
+    return save_transcript_to_file(transcript_content, output_file_path)
+
+if MSGSPEC_AVAILABLE:
+    # Only the fields we read are declared; msgspec skips everything else in the document without building it
+    class TranscriptPhrase(msgspec.Struct):
+        lexical: Optional[str] = None
+
+    class Transcript(msgspec.Struct):
+        combinedRecognizedPhrases: Optional[List[TranscriptPhrase]] = None # Azure may send null, same as a missing list
+        displayText: Optional[str] = None
+
+def parse_transcript(raw_json):
+    """Parses a transcript JSON document into (iterable of phrase 'lexical' texts, 'displayText')."""
+    if MSGSPEC_AVAILABLE:
+        transcript = msgspec.json.decode(raw_json, type=Transcript)
+        return (phrase.lexical for phrase in transcript.combinedRecognizedPhrases or ()), transcript.displayText
+    transcript = parse_json(raw_json)
+    return (phrase.get('lexical') for phrase in transcript.get('combinedRecognizedPhrases') or ()), transcript.get('displayText')
+
+def write_lexical_text(lexical_texts, f):
+    """Writes the non-empty phrase texts to the open file f, space-separated. Returns the characters written."""
+    chars_written = 0
+    for lexical in lexical_texts:
+        if lexical := (lexical or '').strip():
+            if chars_written:
+                f.write(' '); chars_written += 1
+            f.write(lexical); chars_written += len(lexical)
+    return chars_written
+
 def save_transcript_to_file(transcript_content, output_file_path):
-    """Parses transcript JSON and saves formatted text to a file."""
+    """Parses the raw transcript JSON and saves formatted text to a file, streaming phrases straight to disk."""
     logging.info(f"Parsing and saving transcript to: {output_file_path}")
     if not transcript_content: logging.error("Cannot save transcript, content is empty."); return False
 
+    tmp_path = output_file_path + TMP_SUFFIX
     try:
-        phrases = transcript_content.get('combinedRecognizedPhrases', [])
-        full_text = " ".join([p.get('lexical', '') for p in phrases if p.get('lexical')]).strip()
-
-        if not full_text:
-             logging.warning("Primary parsing (combinedRecognizedPhrases/lexical) yielded empty text. Checking 'displayText'...")
-             if 'displayText' in transcript_content:
-                  full_text = transcript_content['displayText'].strip()
+        # The output directory is created once by load_config(), so no per-item makedirs here
+        lexical_texts, display_text = parse_transcript(transcript_content)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            chars_written = write_lexical_text(lexical_texts, f)
 
-        if full_text:
-            logging.info(f"Extracted text length: {len(full_text)} characters.")
-            output_dir = os.path.dirname(output_file_path)
-            if output_dir: os.makedirs(output_dir, exist_ok=True)
+            if not chars_written:
+                 logging.warning("Primary parsing (combinedRecognizedPhrases/lexical) yielded empty text. Checking 'displayText'...")
+                 display_text = (display_text or '').strip()
+                 f.write(display_text); chars_written = len(display_text)
 
-            with open(output_file_path, 'w', encoding='utf-8') as f:
-                f.write(full_text)
+        if chars_written:
+            os.replace(tmp_path, output_file_path)
+            logging.info(f"Extracted text length: {chars_written} characters.")
             logging.info(f"Transcript successfully saved to {output_file_path}")
             return True
         else:
+            os.remove(tmp_path) # Don't leave an empty transcript that would be skipped on the next run
             logging.error("Could not extract any text from transcript JSON.")
             raw_json_path = output_file_path + ".raw.json"
             try:
-                 with open(raw_json_path, 'w', encoding='utf-8') as f_raw:
-                     json.dump(transcript_content, f_raw, indent=2, ensure_ascii=False)
+                 with open(raw_json_path + TMP_SUFFIX, 'wb') as f_raw:
+                     f_raw.write(transcript_content) # The document exactly as Azure returned it
+                 os.replace(raw_json_path + TMP_SUFFIX, raw_json_path)
                  logging.info(f"Raw transcript JSON saved to {raw_json_path} for debugging.")
             except Exception as dump_e:
                  logging.error(f"Failed to save raw transcript JSON: {dump_e}")
@@ -373,138 +816,210 @@ def save_transcript_to_file(transcript_content, output_file_path):
 
     except Exception as e:
         logging.error(f"Error parsing/saving transcript content: {e}")
+        if os.path.exists(tmp_path): os.remove(tmp_path)
         return False
 
-def cleanup_local_file(file_path):
-    """Deletes a local file, logging outcome."""
-    logging.info(f"Attempting cleanup: Deleting local file '{file_path}'...")
+# --- Main Execution Logic ---
+
+# Blob deletions run in the background so cleanup never delays the next item; main() waits for them before exiting
+_cleanup_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cleanup")
+
+def transcript_exists(output_transcript_path):
+    """Returns True if a non-empty transcript file from a previous run exists at the path (one stat call)."""
     try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            logging.info(f"Local file '{file_path}' deleted successfully.")
-            return True
-        else:
-            logging.warning(f"Local file '{file_path}' not found for deletion.")
-            return True
-    except OSError as e:
-        logging.error(f"Failed to delete local file '{file_path}': {e}")
+        st = os.stat(output_transcript_path)
+    except OSError:
         return False
+    return stat.S_ISREG(st.st_mode) and st.st_size > 0
+
+def read_pairs(lines):
+    """Yields (output_base_filename, m3u8_url) pairs from the non-blank input lines; a trailing odd line is dropped."""
+    stripped_lines = (line for raw_line in lines if (line := raw_line.strip()))
+    for output_base_filename in stripped_lines:
+        m3u8_url = next(stripped_lines, None)
+        if m3u8_url is None:
+            logging.warning("Input file has an odd number of lines. Ignoring the last line: '%s'", output_base_filename)
+            return
+        yield output_base_filename, m3u8_url
+
+def cleanup_item(output_base_filename, blob_client):
+    """Schedules deletion of the item's temporary blob from Azure Storage."""
+    logging.info(f"--- Cleaning up for item: {output_base_filename} ---")
+    _cleanup_pool.submit(delete_blob, blob_client)
+
+def start_item(config, job_slots, item_num, output_base_filename, m3u8_url, blob_service_client):
+    """Stage 1: converts/uploads the audio and submits the transcription job.
+
+    job_slots is the semaphore bounding in-flight Speech jobs; a slot is held from submit until the job reaches a final state.
+    Returns (blob_client, job_url) on success, or None after cleaning up on failure.
+    """
+    logging.info(f"\n=== Processing Item {item_num}: {output_base_filename} ===")
+    logging.info(f"M3U8 URL: {m3u8_url}")
+
+    job_id_part = short_id()
+    output_format = choose_output_format(config, m3u8_url)
+    blob_name = f"{job_id_part}_{output_base_filename}{output_format[2]}"
+    job_base_name = f"transcript_{output_base_filename}"
+    blob_client = blob_service_client.get_blob_client(container=config.azure_storage_input_container, blob=blob_name)
+    job_slot_held = False
+
+    try:
+        # 1+2. Convert M3U8 to MP3 and stream it into Azure Blob Storage
+        if not convert_and_upload(config, m3u8_url, blob_client, output_format):
+            raise RuntimeError(f"FFmpeg conversion/upload failed for {m3u8_url}")
+
+        # Wait for a free Speech job slot so concurrent jobs stay within the API quota
+        job_slots.acquire(); job_slot_held = True
+
+        # 3. Get SAS URI for the blob
+        sas_token = get_container_sas_token(config)
+        if not sas_token:
+            raise RuntimeError(f"Failed to get SAS URI for blob: {blob_name}")
+        sas_uri = f"{blob_client.url}?{sas_token}"
+
+        # 4. Submit Azure Speech Transcription Job
+        job_url = submit_transcription_job(config, sas_uri, job_base_name)
+        if not job_url:
+            raise RuntimeError(f"Failed to submit transcription job for {job_base_name}")
+        return blob_client, job_url
+
     except Exception as e:
-         logging.error(f"Unexpected error deleting local file '{file_path}': {e}")
-         return False
+        logging.error(f"--- Error processing item '{output_base_filename}': {e} ---")
+        if job_slot_held: job_slots.release()
+        cleanup_item(output_base_filename, blob_client) # A partial blob may exist even if streaming fails
+        return None
 
-# --- Main Execution Logic ---
+def save_item(config, output_base_filename, blob_client, final_status, job_data):
+    """Stage 3: downloads and saves the transcript of a finished job. Returns True on success."""
+    output_transcript_path = os.path.join(config.local_transcript_output_dir, f"{output_base_filename}.txt")
+    succeeded = False
+
+    try:
+        # 6. Result Handling & Saving
+        if final_status == 'Succeeded':
+            logging.info("Job succeeded. Retrieving and saving transcript...")
+            if retrieve_transcript_to_file(config, job_data, output_transcript_path):
+                logging.info(f"Successfully processed and saved transcript for '{output_base_filename}'.")
+                succeeded = True
+            else:
+                raise RuntimeError("Failed to download or save the transcript after job success.")
+        elif final_status == 'Failed':
+            error_details = job_data.get('error', {}) if job_data else {}
+            logging.error(f"Transcription job failed for '{output_base_filename}'. Details: {error_details}")
+            raise RuntimeError(f"Transcription job failed. Details: {error_details}")
+        else: # Timeout, PollingError, NotFound etc.
+             logging.error(f"Job for '{output_base_filename}' did not succeed. Final status: {final_status}")
+             raise RuntimeError(f"Job did not succeed. Final status: {final_status}")
+
+    except Exception as e:
+        logging.error(f"--- Error processing item '{output_base_filename}': {e} ---")
+
+    finally:
+        cleanup_item(output_base_filename, blob_client)
+        # Optional: Consider deleting completed/failed Azure job record if desired
+        # if job_url and final_status in ['Succeeded', 'Failed']:
+        #    try: _make_speech_api_request("DELETE", job_url, headers=config.speech_headers(), timeout=30) except: pass
+
+    return succeeded
 
 def main(input_file_path):
     """Main function to process the input file."""
+    setup_logging()
+    if not TENACITY_AVAILABLE:
+        logging.warning("`tenacity` library not found. Proceeding without automatic API retries. Install with `pip install tenacity` for better robustness.")
+    config = load_config()
+    configure_http_session(config)
     logging.info(f"--- Starting Batch Processing ---")
     logging.info(f"Input file: {input_file_path}")
-    logging.info(f"Temporary audio dir: {LOCAL_TEMP_AUDIO_DIR}")
-    logging.info(f"Transcript output dir: {LOCAL_TRANSCRIPT_OUTPUT_DIR}")
+    logging.info(f"Transcript output dir: {config.local_transcript_output_dir}")
 
     try:
-        blob_service_client = initialize_blob_service_client()
+        blob_service_client = initialize_blob_service_client(config)
     except Exception:
         logging.critical("Failed to initialize Azure Blob Service Client. Cannot proceed.")
         sys.exit(1)
 
+    # Sign the shared container SAS once up front: workers then reuse it, and bad storage credentials fail fast
+    if not get_container_sas_token(config):
+        logging.critical("Failed to generate a SAS token for the input container. Cannot proceed.")
+        sys.exit(1)
+
     try:
-        with open(input_file_path, 'r', encoding='utf-8') as f:
-            lines = [line.strip() for line in f if line.strip()]
+        input_file = open(input_file_path, 'r', encoding='utf-8')
     except FileNotFoundError:
         logging.error(f"Input file not found: {input_file_path}"); sys.exit(1)
     except Exception as e:
         logging.error(f"Error reading input file {input_file_path}: {e}"); sys.exit(1)
 
-    if len(lines) % 2 != 0:
-        logging.warning("Input file has an odd number of lines. Processing pairs, last line may be ignored.")
-
-    total_items = len(lines) // 2
-    success_count = 0; error_count = 0
-
-    for i in range(0, len(lines) -1, 2):
-        item_num = (i // 2) + 1
-        output_base_filename = lines[i]
-        m3u8_url = lines[i+1]
-
-        logging.info(f"\n=== Processing Item {item_num}/{total_items}: {output_base_filename} ===")
-        logging.info(f"M3U8 URL: {m3u8_url}")
+    total_items = 0
+    success_count = 0; error_count = 0; skipped_count = 0
 
-        job_id_part = uuid.uuid4().hex[:8]
-        temp_mp3_filename = f"{job_id_part}_{output_base_filename}.mp3"
-        temp_mp3_path = os.path.join(LOCAL_TEMP_AUDIO_DIR, temp_mp3_filename)
-        output_transcript_path = os.path.join(LOCAL_TRANSCRIPT_OUTPUT_DIR, f"{output_base_filename}.txt")
-        blob_name = temp_mp3_filename
-        job_base_name = f"transcript_{output_base_filename}"
-
-        mp3_created = False; blob_uploaded_name = None; job_url = None; final_status = None
+    # Three pipeline stages: a pool converts/uploads/submits items, a single thread polls every submitted
+    # job per tick, and a second pool downloads/saves transcripts as their jobs finish. Conversion of the
+    # next items overlaps with Azure transcribing (and us polling) the items already submitted.
+    logging.info(f"Processing items with {config.max_conversion_workers} conversion workers and {config.max_workers} download workers.")
+    # Bounds the number of submitted-but-unfinished Speech jobs; acquired before submit, released once the job is done
+    job_slots = threading.BoundedSemaphore(max(1, config.max_concurrent_jobs))
+    new_jobs = queue.Queue() # (output_base_filename, blob_client, job_url) handed from stage 1 to the poller
+    save_futures = {}
+    with input_file, \
+         ThreadPoolExecutor(max_workers=max(1, config.max_conversion_workers), thread_name_prefix="convert") as convert_executor, \
+         ThreadPoolExecutor(max_workers=max(1, config.max_workers), thread_name_prefix="save") as save_executor:
+        def on_job_done(job, final_status, job_data): # Runs on the poller thread
+            job_slots.release()
+            save_futures[save_executor.submit(save_item, config, job.output_base_filename, job.blob_client, final_status, job_data)] = job.output_base_filename
+        poller = threading.Thread(target=poll_jobs, args=(config, new_jobs, on_job_done), name="poll", daemon=True)
+        poller.start()
 
+        # Items are submitted as they are read, so the first conversion starts before the whole input is parsed
+        start_futures = {}
         try:
-            # 1. Convert M3U8 to MP3
-            if not convert_m3u8_to_mp3(m3u8_url, temp_mp3_path):
-                raise RuntimeError(f"FFmpeg conversion failed for {m3u8_url}")
-            mp3_created = True
-
-            # 2. Upload MP3 to Azure Blob Storage
-            if not upload_blob(temp_mp3_path, blob_name, blob_service_client):
-                 raise RuntimeError(f"Failed to upload blob: {blob_name}")
-            blob_uploaded_name = blob_name
-
-            # 3. Get SAS URI for the blob
-            sas_uri = get_blob_sas_uri(blob_uploaded_name, blob_service_client)
-            if not sas_uri:
-                raise RuntimeError(f"Failed to get SAS URI for blob: {blob_uploaded_name}")
-
-            # 4. Submit Azure Speech Transcription Job
-            job_url = submit_transcription_job(sas_uri, job_base_name)
-            if not job_url:
-                raise RuntimeError(f"Failed to submit transcription job for {job_base_name}")
-
-            # 5. Polling Loop for Job Completion
-            final_status, job_data = poll_job_status(job_url)
-
-            # 6. Result Handling & Saving
-            if final_status == 'Succeeded':
-                logging.info("Job succeeded. Retrieving and saving transcript...")
-                transcript_content = download_transcript_content(job_data)
-                if transcript_content:
-                    if save_transcript_to_file(transcript_content, output_transcript_path):
-                        success_count += 1
-                        logging.info(f"Successfully processed and saved transcript for '{output_base_filename}'.")
-                    else:
-                        raise RuntimeError("Failed to save the downloaded transcript.")
-                else:
-                     raise RuntimeError("Failed to download transcript content after job success.")
-            elif final_status == 'Failed':
-                error_details = job_data.get('error', {}) if job_data else {}
-                logging.error(f"Transcription job failed for '{output_base_filename}'. Details: {error_details}")
-                raise RuntimeError(f"Transcription job failed. Details: {error_details}")
-            else: # Timeout, PollingError, NotFound etc.
-                 logging.error(f"Job for '{output_base_filename}' did not succeed. Final status: {final_status}")
-                 raise RuntimeError(f"Job did not succeed. Final status: {final_status}")
-
+            for output_base_filename, m3u8_url in read_pairs(input_file):
+                total_items += 1
+                # Skip items already transcribed by a previous run so interrupted batches can simply be re-run
+                output_transcript_path = os.path.join(config.local_transcript_output_dir, f"{output_base_filename}.txt")
+                if not config.force_reprocess and transcript_exists(output_transcript_path):
+                    logging.info("Skipping item %d '%s': transcript already exists at %s.", total_items, output_base_filename, output_transcript_path)
+                    skipped_count += 1
+                    continue
+                start_futures[convert_executor.submit(start_item, config, job_slots, total_items, output_base_filename, m3u8_url, blob_service_client)] = output_base_filename
         except Exception as e:
-            logging.error(f"--- Error processing item '{output_base_filename}': {e} ---")
-            error_count += 1
-
-        finally:
-            logging.info(f"--- Cleaning up for item: {output_base_filename} ---")
-            if blob_uploaded_name:
-                logging.info(f"Deletion condition met. Calling delete_blob for '{blob_uploaded_name}'...")
-                delete_blob(blob_uploaded_name, blob_service_client)
-            else:
-                 logging.info(f"Skipping blob deletion as upload may not have occurred for {blob_name}.")
-            if mp3_created:
-                cleanup_local_file(temp_mp3_path)
+            logging.error(f"Error reading input file {input_file_path}: {e}. Finishing the {len(start_futures)} items already queued.")
+        logging.info(f"Queued {len(start_futures)} of {total_items} items for processing.")
+
+        for future in as_completed(start_futures):
+            output_base_filename = start_futures[future]
+            try:
+                started = future.result()
+            except Exception as e:
+                logging.error(f"--- Unhandled error in worker for item '{output_base_filename}': {e} ---")
+                started = None
+            if started is None:
+                error_count += 1
+                continue
+            blob_client, job_url = started
+            new_jobs.put((output_base_filename, blob_client, job_url))
+        new_jobs.put(None) # No more submissions; the poller exits once every outstanding job is final
+        poller.join() # save_futures is complete (and no longer touched by the poller) after this
+
+        for future in as_completed(save_futures):
+            try:
+                succeeded = future.result()
+            except Exception as e:
+                logging.error(f"--- Unhandled error in worker for item '{save_futures[future]}': {e} ---")
+                succeeded = False
+            if succeeded:
+                success_count += 1
             else:
-                 logging.info(f"Skipping local MP3 deletion as conversion may not have occurred for {temp_mp3_path}.")
-            # Optional: Consider deleting completed/failed Azure job record if desired
-            # if job_url and final_status in ['Succeeded', 'Failed']:
-            #    try: _make_speech_api_request("DELETE", job_url, headers=SPEECH_HEADERS, timeout=30) except: pass
+                error_count += 1
+
+    logging.info("Waiting for pending blob cleanups to finish...")
+    _cleanup_pool.shutdown(wait=True)
 
     logging.info("\n--- Batch Processing Complete ---")
     logging.info(f"Total items in input: {total_items}")
     logging.info(f"Successfully processed: {success_count}")
+    logging.info(f"Skipped (transcript already exists): {skipped_count}")
     logging.info(f"Items with errors: {error_count}")
     logging.info("------------------------------")
 
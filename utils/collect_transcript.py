@@ -1,11 +1,19 @@
 # collect_transcript.py
 
+import argparse
+import atexit
 import os
+import random
+import re
+import signal
 import sys
 import time
 import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 # Optional: Install tenacity for robust retries: pip install tenacity
 try:
@@ -18,6 +26,12 @@ except ImportError:
         def decorator(func):
             return func
         return decorator
+# Optional: Install ijson to stream-parse large transcripts instead of loading them whole: pip install ijson
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
 
 # --- User Input ---
 # TODO: Replace these values with the actual Job Name and Job ID you want to retrieve
@@ -33,7 +47,7 @@ load_dotenv()
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(module)s - %(message)s',
+    format='%(asctime)s - %(levelname)s - %(threadName)s - %(module)s - %(message)s',
     handlers=[
         logging.StreamHandler(sys.stdout)
         # Optionally add a FileHandler if needed:
@@ -50,8 +64,12 @@ AZURE_SPEECH_API_KEY = os.getenv("AZURE_SPEECH_API_KEY")
 AZURE_SPEECH_REGION = os.getenv("AZURE_SPEECH_REGION")
 # Use LOCAL_TRANSCRIPT_OUTPUT_DIR from .env for saving the final transcript
 LOCAL_TRANSCRIPT_OUTPUT_DIR = os.getenv("LOCAL_TRANSCRIPT_OUTPUT_DIR", "./transcripts/")
+# Same polling settings as main.py: exponential backoff from the initial interval up to POLLING_INTERVAL_SECONDS, bounded by a wall-clock budget
 POLLING_INTERVAL_SECONDS = int(os.getenv("POLLING_INTERVAL_SECONDS", 30))
-MAX_POLLING_ATTEMPTS = int(os.getenv("MAX_POLLING_ATTEMPTS", 120))
+POLLING_INITIAL_INTERVAL_SECONDS = int(os.getenv("POLLING_INITIAL_INTERVAL_SECONDS", 2))
+MAX_POLLING_ATTEMPTS = int(os.getenv("MAX_POLLING_ATTEMPTS", 120)) # Legacy: only used to derive the default below
+MAX_POLLING_WALLCLOCK_SECONDS = int(os.getenv("MAX_POLLING_WALLCLOCK_SECONDS", MAX_POLLING_ATTEMPTS * POLLING_INTERVAL_SECONDS))
+POLLING_JITTER = 0.2 # Backoff delays are randomized by +/-20%
 API_VERSION = os.getenv("API_VERSION", "v3.2") # Ensure this matches the version used for job submission
 
 # Validate essential configuration
@@ -59,15 +77,6 @@ if not all([AZURE_SPEECH_API_KEY, AZURE_SPEECH_REGION]):
     logging.error("Missing essential Azure credentials in .env file (AZURE_SPEECH_API_KEY, AZURE_SPEECH_REGION). Exiting.")
     sys.exit(1)
 
-if not JOB_ID:
-    logging.error("JOB_ID is not set at the top of the script. Exiting.")
-    sys.exit(1)
-
-if not JOB_NAME:
-    logging.warning("JOB_NAME is not set. The output file will be named based on JOB_ID.")
-    # Use JOB_ID as fallback filename if JOB_NAME is empty
-    JOB_NAME = JOB_ID
-
 # Azure Speech API constants
 SPEECH_BASE_URL = f"https://{AZURE_SPEECH_REGION}.api.cognitive.microsoft.com/speechtotext/{API_VERSION}"
 SPEECH_HEADERS = {
@@ -82,16 +91,44 @@ except OSError as e:
     logging.error(f"Error creating transcript output directory '{LOCAL_TRANSCRIPT_OUTPUT_DIR}': {e}")
     sys.exit(1)
 
+# Terminal job states from previous runs, so re-running for a finished job skips polling (and the download, if the transcript is already on disk)
+JOB_CACHE_PATH = os.path.join(LOCAL_TRANSCRIPT_OUTPUT_DIR, ".job_cache.json")
+_stop_event = threading.Event() # Set on Ctrl+C so poll loops stop waiting immediately
+
+# --- Shared HTTP Session ---
+# Reuse TCP+TLS connections across polls and the file list / SAS downloads instead of reconnecting per request.
+# Retries are handled by api_retry_strategy below, so the adapter itself does not retry.
+http_session = requests.Session()
+atexit.register(http_session.close)
+
+def configure_http_session(max_workers):
+    """Sizes the shared session's connection pool so each parallel job worker can keep its own connection."""
+    http_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(8, max_workers), max_retries=0)
+    http_session.mount("https://", http_adapter)
+    http_session.mount("http://", http_adapter)
+
+configure_http_session(1) # Default pool for a single job; retrieve_transcripts() resizes it for its workers
+
 # --- Retry Strategy (Copied from main.py [cite: 1]) ---
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_RETRY_EXCEPTIONS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError)
+
+def _log_api_retry(retry_state):
+    if not logging.getLogger().isEnabledFor(logging.WARNING):
+        return
+    outcome = retry_state.outcome # A Future holding either the response or the raised exception
+    reason = type(outcome.exception()).__name__ if outcome.failed else getattr(outcome.result(), 'status_code', None)
+    logging.warning("Retrying API call due to %s. Attempt #%d. Waiting %.2fs...", reason, retry_state.attempt_number, retry_state.next_action.sleep)
+
 if TENACITY_AVAILABLE:
     api_retry_strategy = retry(
         wait=wait_exponential(multiplier=1, min=2, max=10),
         stop=stop_after_attempt(5),
         retry=(
-            retry_if_exception_type((requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError)) |
-            retry_if_result(lambda r: isinstance(r, requests.Response) and r.status_code in [429, 500, 502, 503, 504])
+            retry_if_exception_type(_RETRY_EXCEPTIONS) |
+            retry_if_result(lambda r: getattr(r, 'status_code', None) in _RETRY_STATUSES)
         ),
-        before_sleep=lambda retry_state: logging.warning(f"Retrying API call due to {retry_state.outcome.status_code if isinstance(retry_state.outcome, requests.Response) else type(retry_state.outcome).__name__}. Attempt #{retry_state.attempt_number}. Waiting {retry_state.next_action.sleep:.2f}s...")
+        before_sleep=_log_api_retry
     )
 else:
     logging.warning("`tenacity` library not found. Proceeding without automatic API retries. Install with `pip install tenacity` for better robustness.")
@@ -100,25 +137,53 @@ else:
 # --- Helper Functions (Adapted from main.py [cite: 1]) ---
 
 @api_retry_strategy
-def _make_speech_api_request(method, url, headers=None, json_payload=None, data=None, timeout=60):
+def _make_speech_api_request(method, url, headers=None, json_payload=None, data=None, timeout=60, stream=False):
     """Internal helper to make requests with retry."""
-    response = requests.request(method, url, headers=headers, json=json_payload, data=data, timeout=timeout)
+    response = http_session.request(method, url, headers=headers, json=json_payload, data=data, timeout=timeout, stream=stream)
     response.raise_for_status() # Raise HTTPError for 4xx/5xx
     return response
 
-def poll_job_status(job_url):
-    """Polls the job status URL until completion or timeout."""
-    logging.info(f"Polling job status every {POLLING_INTERVAL_SECONDS}s (Max {MAX_POLLING_ATTEMPTS} attempts): {job_url}")
-    job_data = None; final_status = None; attempts = 0
-    while attempts < MAX_POLLING_ATTEMPTS:
-        attempts += 1
-        job_id_short = job_url.split('/')[-1]
-        # logging.info(f"Polling attempt {attempts}/{MAX_POLLING_ATTEMPTS} for job {job_id_short}...")
+_PENDING_STATUS_RE = re.compile(rb'"status"\s*:\s*"(NotStarted|Running)"')
+
+def get_job_status_once(job_url, etag=None, last_job_data=None):
+    """Fetches the job once and returns (status, job_data, etag). Request errors propagate to the caller.
+
+    If etag (from the previous poll) is given it is sent as If-None-Match; a 304 Not Modified
+    then reuses last_job_data instead of transferring and parsing the unchanged body again.
+    While the job is still pending only its status is read, and job_data is just {'status': ...}.
+    """
+    headers = {**SPEECH_HEADERS, 'If-None-Match': etag} if etag else SPEECH_HEADERS
+    response = _make_speech_api_request("GET", job_url, headers=headers, timeout=30)
+    if response.status_code == 304 and last_job_data is not None:
+        return last_job_data.get('status'), last_job_data, etag
+    match = _PENDING_STATUS_RE.search(response.content)
+    job_data = {'status': match.group(1).decode('ascii')} if match else response.json()
+    return job_data.get('status'), job_data, response.headers.get('ETag')
+
+def _next_delay(backoff):
+    """Returns the jittered wait before the next poll, so jobs polled in parallel don't stay in lock-step."""
+    return backoff * random.uniform(1 - POLLING_JITTER, 1 + POLLING_JITTER)
+
+def poll_job_status(job_url, stop_event=None):
+    """Polls the job status URL until completion, timeout, or until stop_event (default: the Ctrl+C event) is set.
+
+    The wait between polls starts at POLLING_INITIAL_INTERVAL_SECONDS and grows 1.5x per poll up to
+    POLLING_INTERVAL_SECONDS; polling gives up once MAX_POLLING_WALLCLOCK_SECONDS have elapsed.
+    """
+    if stop_event is None: stop_event = _stop_event
+    logging.info(f"Polling job status with backoff {POLLING_INITIAL_INTERVAL_SECONDS}s-{POLLING_INTERVAL_SECONDS}s (Max {MAX_POLLING_WALLCLOCK_SECONDS}s): {job_url}")
+    job_data = None; final_status = None; attempts = 0; etag = None
+    job_id_short = job_url.split('/')[-1]
+    deadline = time.monotonic() + MAX_POLLING_WALLCLOCK_SECONDS
+    backoff = POLLING_INITIAL_INTERVAL_SECONDS; delay = 0
+    while True:
+        attempts += 1; failed = False
         try:
-            if attempts > 1: time.sleep(POLLING_INTERVAL_SECONDS)
-            response = _make_speech_api_request("GET", job_url, headers=SPEECH_HEADERS, timeout=30)
-            job_data = response.json(); current_status = job_data.get('status')
-            logging.info(f"Polling attempt {attempts}/{MAX_POLLING_ATTEMPTS}: Job status is '{current_status}'")
+            # Waits on the event instead of sleeping so Ctrl+C ends the poll right away
+            if stop_event.wait(delay):
+                logging.warning(f"Polling interrupted for job {job_id_short}."); final_status = 'Interrupted'; break
+            current_status, job_data, etag = get_job_status_once(job_url, etag, job_data)
+            logging.info(f"Polling attempt {attempts}: Job status is '{current_status}'")
             if current_status in ['Succeeded', 'Failed']:
                 final_status = current_status; break
             # Check for other potential intermediate states if needed (e.g., 'Running', 'NotStarted')
@@ -129,30 +194,41 @@ def poll_job_status(job_url):
             logging.warning(f"Polling attempt {attempts} failed for job {job_id_short}: {e}")
             if e.response is not None and e.response.status_code == 404:
                  logging.error(f"Job URL {job_url} not found (404) during polling. Stopping poll."); final_status = 'NotFound'; break
-            if attempts >= MAX_POLLING_ATTEMPTS: final_status = 'PollingError'; break
+            failed = True
         except Exception as e:
             logging.error(f"Unexpected polling error for job {job_id_short}: {e}. Stopping poll."); final_status = 'PollingError'; break
 
-    if final_status not in ['Succeeded', 'Failed', 'NotFound', 'PollingError']:
-        logging.warning(f"Polling stopped after {MAX_POLLING_ATTEMPTS} attempts for job {job_id_short}. Final status check might have timed out.")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            if failed: final_status = 'PollingError' # The polling budget ran out after an error
+            break
+        delay = min(_next_delay(backoff), remaining)
+        backoff = min(backoff * 1.5, POLLING_INTERVAL_SECONDS)
+
+    if final_status not in ['Succeeded', 'Failed', 'NotFound', 'PollingError', 'Interrupted']:
+        logging.warning(f"Polling stopped after {MAX_POLLING_WALLCLOCK_SECONDS}s ({attempts} attempts) for job {job_id_short}. Final status check might have timed out.")
         # Attempt one last status check without waiting
         try:
-            response = _make_speech_api_request("GET", job_url, headers=SPEECH_HEADERS, timeout=30)
-            job_data = response.json(); current_status = job_data.get('status')
+            current_status, job_data, etag = get_job_status_once(job_url, etag, job_data)
             logging.info(f"Final status check: Job status is '{current_status}'")
             if current_status in ['Succeeded', 'Failed']:
                  final_status = current_status
             else:
-                 final_status = 'Timeout' # If still not done after max attempts
+                 final_status = 'Timeout' # If still not done when the polling budget ran out
         except Exception as e:
             logging.error(f"Final status check failed: {e}")
             final_status = 'PollingError' # Error during final check
 
     return final_status, job_data
 
-def download_transcript_content(job_data):
-    """Downloads the transcript JSON content if job succeeded."""
-    logging.info("Attempting to download transcript content...")
+def _request_stop(signum, frame):
+    """SIGINT handler: stops every poll loop; a second Ctrl+C falls back to KeyboardInterrupt."""
+    logging.warning("Interrupt received. Stopping polls (press Ctrl+C again to abort immediately)...")
+    _stop_event.set()
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+
+def get_transcript_content_url(job_data):
+    """Returns the SAS content URL of the job's transcription result file, or None."""
     if not job_data: logging.error("No job data available for download."); return None
     files_url = job_data.get('links', {}).get('files')
     if not files_url: logging.error(f"No 'files' link in job data: {job_data}"); return None
@@ -164,53 +240,100 @@ def download_transcript_content(job_data):
 
         transcript_content_url = next((f.get('links', {}).get('contentUrl') for f in files_data.get('values', []) if f.get('kind') == 'Transcription'), None)
         if not transcript_content_url: logging.error(f"Transcript 'contentUrl' not found in files list: {files_data}"); return None
+        return transcript_content_url
 
-        logging.info(f"Downloading transcript content from SAS URL..."); # Avoid logging potentially sensitive SAS URL
-
-        # Use simple requests.get for SAS URL, but reuse the retry wrapper for consistency
-        @api_retry_strategy
-        def download_sas_content(url):
-             # Use the internal helper which has logging and error handling built-in
-             response = _make_speech_api_request("GET", url, timeout=120) # Longer timeout for potential large transcript
-             return response.json()
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Failed to get transcript file list after retries: {e}")
+        if e.response is not None: logging.error(f"Final status code: {e.response.status_code}, Response body: {e.response.text}")
+        return None
+    except Exception as e:
+        logging.error(f"Unexpected error getting transcript file list: {e}"); return None
 
-        transcript_json = download_sas_content(transcript_content_url)
+def download_transcript_content(transcript_content_url):
+    """Downloads and parses the whole transcript JSON document."""
+    logging.info(f"Downloading transcript content from SAS URL..."); # Avoid logging potentially sensitive SAS URL
+    try:
+        # _make_speech_api_request already applies api_retry_strategy, so no extra retry wrapper here
+        response = _make_speech_api_request("GET", transcript_content_url, timeout=120) # Longer timeout for potential large transcript
+        transcript_json = response.json()
         logging.info("Transcript content downloaded successfully.")
         return transcript_json
 
     except requests.exceptions.RequestException as e:
-        logging.error(f"Failed to download transcript files/content after retries: {e}")
+        logging.error(f"Failed to download transcript content after retries: {e}")
         if e.response is not None: logging.error(f"Final status code: {e.response.status_code}, Response body: {e.response.text}")
         return None
     except Exception as e:
         logging.error(f"Unexpected error during transcript download: {e}"); return None
 
+# Transcripts are written to '<path>.tmp' and renamed into place with os.replace() (as in main.py), so an
+# interrupted write never leaves a partial .txt that a later run would mistake for a finished transcript
+TMP_SUFFIX = ".tmp"
+
+def stream_transcript_to_file(transcript_content_url, output_file_path):
+    """Stream-parses the transcript with ijson, writing each phrase's 'lexical' text to disk as it arrives.
+
+    Returns True if any text was written. Returns False otherwise (including on errors), leaving no output file,
+    so the caller can fall back to a full download to try 'displayText' and save the raw JSON for debugging.
+    """
+    logging.info(f"Streaming transcript content from SAS URL..."); # Avoid logging potentially sensitive SAS URL
+    tmp_path = output_file_path + TMP_SUFFIX
+    chars_written = 0
+    try:
+        response = _make_speech_api_request("GET", transcript_content_url, timeout=120, stream=True)
+        with response, open(tmp_path, 'w', encoding='utf-8') as f:
+            response.raw.decode_content = True # Let urllib3 undo any gzip/deflate transfer encoding
+            chars_written = write_lexical_text(ijson.items(response.raw, 'combinedRecognizedPhrases.item.lexical'), f)
+    except Exception as e:
+        logging.warning(f"Streaming transcript parse failed ({e}). Falling back to full download.")
+        chars_written = 0
+
+    if chars_written:
+        os.replace(tmp_path, output_file_path)
+        logging.info(f"Extracted text length: {chars_written} characters.")
+        logging.info(f"Transcript successfully saved to {output_file_path}")
+        return True
+    if os.path.exists(tmp_path): os.remove(tmp_path)
+    return False
+
+def write_lexical_text(lexical_texts, f):
+    """Writes the non-empty phrase texts to the open file f, space-separated. Returns the characters written."""
+    chars_written = 0
+    for lexical in lexical_texts:
+        if lexical := (lexical or '').strip():
+            if chars_written:
+                f.write(' '); chars_written += 1
+            f.write(lexical); chars_written += len(lexical)
+    return chars_written
+
 def save_transcript_to_file(transcript_content, output_file_path):
-    """Parses transcript JSON and saves formatted text to a file."""
+    """Parses transcript JSON and saves formatted text to a file, writing phrases straight to disk."""
     logging.info(f"Parsing and saving transcript to: {output_file_path}")
     if not transcript_content: logging.error("Cannot save transcript, content is empty."); return False
 
+    tmp_path = output_file_path + TMP_SUFFIX
     try:
-        # Attempt extraction using the primary structure from main.py [cite: 1]
-        phrases = transcript_content.get('combinedRecognizedPhrases', [])
-        full_text = " ".join([p.get('lexical', '') for p in phrases if p.get('lexical')]).strip()
-
-        # Fallback if primary structure yields no text
-        if not full_text:
-             logging.warning("Primary parsing (combinedRecognizedPhrases/lexical) yielded empty text. Checking 'displayText'...")
-             if 'displayText' in transcript_content:
-                  full_text = transcript_content['displayText'].strip()
-
-        if full_text:
-            logging.info(f"Extracted text length: {len(full_text)} characters.")
-            output_dir = os.path.dirname(output_file_path)
-            if output_dir: os.makedirs(output_dir, exist_ok=True) # Ensure directory exists just in case
-
-            with open(output_file_path, 'w', encoding='utf-8') as f:
-                f.write(full_text)
+        output_dir = os.path.dirname(output_file_path)
+        if output_dir: os.makedirs(output_dir, exist_ok=True) # Ensure directory exists just in case
+
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            # Attempt extraction using the primary structure from main.py [cite: 1]
+            phrases = transcript_content.get('combinedRecognizedPhrases') or ()
+            chars_written = write_lexical_text((p.get('lexical') for p in phrases), f)
+
+            # Fallback if primary structure yields no text
+            if not chars_written:
+                 logging.warning("Primary parsing (combinedRecognizedPhrases/lexical) yielded empty text. Checking 'displayText'...")
+                 display_text = (transcript_content.get('displayText') or '').strip()
+                 f.write(display_text); chars_written = len(display_text)
+
+        if chars_written:
+            os.replace(tmp_path, output_file_path)
+            logging.info(f"Extracted text length: {chars_written} characters.")
             logging.info(f"Transcript successfully saved to {output_file_path}")
             return True
         else:
+            os.remove(tmp_path) # Don't leave an empty transcript behind
             logging.error("Could not extract any text from the transcript JSON content.")
             # Save raw JSON for debugging if text extraction fails
             raw_json_path = output_file_path + ".raw.json"
@@ -224,8 +347,46 @@ def save_transcript_to_file(transcript_content, output_file_path):
 
     except Exception as e:
         logging.error(f"Error parsing/saving transcript content: {e}")
+        if os.path.exists(tmp_path): os.remove(tmp_path)
         return False
 
+def _load_cache():
+    """Loads the job cache (job_id -> {status, files_url, error, transcript_path, transcript_size}), or an empty one."""
+    try:
+        with open(JOB_CACHE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable job cache '{JOB_CACHE_PATH}': {e}")
+        return {}
+
+_cache_lock = threading.Lock() # Serializes cache updates when several jobs are retrieved in parallel
+
+def _update_cache(job_id, entry):
+    """Re-reads the cache, sets job_id's entry and writes it back, so parallel retrievals don't drop each other's entries."""
+    with _cache_lock:
+        cache = _load_cache()
+        cache[job_id] = entry
+        _save_cache(cache)
+
+def _save_cache(cache):
+    """Writes the job cache atomically (temp file + os.replace)."""
+    tmp_path = JOB_CACHE_PATH + ".tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, JOB_CACHE_PATH)
+    except Exception as e:
+        logging.warning(f"Failed to update job cache '{JOB_CACHE_PATH}': {e}")
+
+def _file_size(path):
+    """Returns the size of the file at path, or None if it doesn't exist."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
 # --- Main Execution ---
 
 def retrieve_transcript(job_name, job_id):
@@ -236,18 +397,47 @@ def retrieve_transcript(job_name, job_id):
     job_url = f"{SPEECH_BASE_URL}/transcriptions/{job_id}"
     output_transcript_path = os.path.join(LOCAL_TRANSCRIPT_OUTPUT_DIR, f"{job_name}.txt")
 
-    final_status, job_data = poll_job_status(job_url)
+    cached = _load_cache().get(job_id)
+    # transcript_size is only recorded once a save has completed, so a file that doesn't match it is not a finished transcript
+    if cached and cached.get('status') == 'Succeeded' and cached.get('transcript_size') and _file_size(output_transcript_path) == cached['transcript_size']:
+        logging.info(f"Job '{job_id}' already succeeded and its transcript exists at '{output_transcript_path}'. Nothing to do.")
+        return
+    if cached and cached.get('status') in ['Succeeded', 'Failed']:
+        # Finished jobs never change state, so skip polling and reuse what the last run saw
+        logging.info(f"Using cached final status '{cached['status']}' for job '{job_id}'.")
+        final_status = cached['status']
+        job_data = {'links': {'files': cached.get('files_url')}, 'error': cached.get('error', {})}
+        cache_entry = cached
+    else:
+        final_status, job_data = poll_job_status(job_url)
+        cache_entry = {
+            'status': final_status,
+            'files_url': (job_data or {}).get('links', {}).get('files'),
+            'error': (job_data or {}).get('error', {}),
+            'transcript_path': output_transcript_path
+        }
+        if final_status in ['Succeeded', 'Failed']:
+            _update_cache(job_id, cache_entry)
 
     if final_status == 'Succeeded':
         logging.info(f"Job '{job_id}' succeeded. Retrieving transcript...")
-        transcript_content = download_transcript_content(job_data)
-        if transcript_content:
-            if save_transcript_to_file(transcript_content, output_transcript_path):
-                logging.info(f"Successfully retrieved and saved transcript for job '{job_id}' to '{output_transcript_path}'.")
-            else:
-                logging.error(f"Failed to save the downloaded transcript for job '{job_id}'.")
+        transcript_content_url = get_transcript_content_url(job_data)
+        if not transcript_content_url:
+            logging.error(f"Failed to get the transcript file list after job '{job_id}' success.")
+        # Constant-memory path when ijson is installed; the full parse is still needed for the displayText fallback
+        elif IJSON_AVAILABLE and stream_transcript_to_file(transcript_content_url, output_transcript_path):
+            logging.info(f"Successfully retrieved and saved transcript for job '{job_id}' to '{output_transcript_path}'.")
+            _update_cache(job_id, {**cache_entry, 'transcript_size': _file_size(output_transcript_path)})
         else:
-             logging.error(f"Failed to download transcript content after job '{job_id}' success.")
+            transcript_content = download_transcript_content(transcript_content_url)
+            if transcript_content:
+                if save_transcript_to_file(transcript_content, output_transcript_path):
+                    logging.info(f"Successfully retrieved and saved transcript for job '{job_id}' to '{output_transcript_path}'.")
+                    _update_cache(job_id, {**cache_entry, 'transcript_size': _file_size(output_transcript_path)})
+                else:
+                    logging.error(f"Failed to save the downloaded transcript for job '{job_id}'.")
+            else:
+                 logging.error(f"Failed to download transcript content after job '{job_id}' success.")
     elif final_status == 'Failed':
         error_details = job_data.get('error', {}) if job_data else {}
         logging.error(f"Transcription job '{job_id}' failed. Details: {error_details}")
@@ -258,9 +448,54 @@ def retrieve_transcript(job_name, job_id):
 
     logging.info(f"--- Finished processing job ID: {job_id} ---")
 
+def read_jobs_file(jobs_file_path):
+    """Reads 'job_name,job_id' lines (blank lines and '#' comments ignored) into a list of (job_name, job_id)."""
+    jobs = []
+    with open(jobs_file_path, 'r', encoding='utf-8') as f:
+        for line_num, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'): continue
+            job_name, sep, job_id = line.rpartition(',')
+            if not sep or not job_id.strip():
+                logging.warning(f"Skipping line {line_num} of {jobs_file_path}: expected 'job_name,job_id', got '{line}'")
+                continue
+            jobs.append((job_name.strip() or job_id.strip(), job_id.strip()))
+    return jobs
+
+def retrieve_transcripts(jobs, max_workers):
+    """Retrieves several jobs in parallel threads sharing one HTTP session; total time is about that of the slowest job."""
+    logging.info(f"Retrieving {len(jobs)} jobs with up to {max_workers} in parallel...")
+    max_workers = max(1, min(max_workers, len(jobs)))
+    configure_http_session(max_workers) # Otherwise urllib3 discards connections beyond the pool size ("Connection pool is full")
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job") as executor:
+        futures = [executor.submit(retrieve_transcript, job_name, job_id) for job_name, job_id in jobs]
+        for (job_name, job_id), future in zip(jobs, futures):
+            try:
+                future.result()
+            except Exception as e:
+                logging.error(f"Unhandled error retrieving job '{job_id}' ({job_name}): {e}")
+
 if __name__ == "__main__":
-    # Make sure JOB_NAME and JOB_ID are set at the top of the script
-    if not JOB_ID:
-         logging.error("Please set the JOB_ID variable at the top of the script.")
+    parser = argparse.ArgumentParser(description="Retrieve transcripts of previously submitted Azure Speech jobs.")
+    parser.add_argument('--jobs-file', type=str, help="File with one 'job_name,job_id' per line. Without it, JOB_NAME/JOB_ID at the top of the script are used.")
+    parser.add_argument('--workers', type=int, default=8, help='Jobs retrieved in parallel with --jobs-file (default: 8).')
+    args = parser.parse_args()
+    signal.signal(signal.SIGINT, _request_stop)
+
+    if args.jobs_file:
+        try:
+            jobs = read_jobs_file(args.jobs_file)
+        except OSError as e:
+            logging.error(f"Failed to read jobs file '{args.jobs_file}': {e}"); sys.exit(1)
+        if not jobs:
+            logging.error(f"No jobs found in '{args.jobs_file}'."); sys.exit(1)
+        retrieve_transcripts(jobs, args.workers)
+    # Without --jobs-file, JOB_NAME and JOB_ID must be set at the top of the script
+    elif not JOB_ID:
+        logging.error("JOB_ID is not set at the top of the script. Set it or pass --jobs-file. Exiting.")
+        sys.exit(1)
     else:
-         retrieve_transcript(JOB_NAME, JOB_ID)
\ No newline at end of file
+        if not JOB_NAME:
+            logging.warning("JOB_NAME is not set. The output file will be named based on JOB_ID.")
+        # Use JOB_ID as fallback filename if JOB_NAME is empty
+        retrieve_transcript(JOB_NAME or JOB_ID, JOB_ID)
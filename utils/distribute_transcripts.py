@@ -1,34 +1,47 @@
 import argparse
+import atexit
 import os
 import re
 import sys
 import ast
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from shutil import copy2
 
+MAX_COPY_WORKERS = 8
+FILENAME_RE = re.compile(r'[a-zA-Z0-9\-]+')
+# Date part of a filename: DD-MM-YY (allow single-digit D/M)
+DATE_RE = re.compile(r'\d{1,2}-\d{1,2}-\d{2}')
+
+DICT_KEYS = ('DESTINATIONS_LEVEL_1', 'DESTINATIONS_LEVEL_2')
+
 def parse_env(env_path):
-    """Parse .env file for required configuration."""
+    """Parse .env file for required configuration. Re-parses only when the file has changed."""
+    return _parse_env_cached(env_path, os.stat(env_path).st_mtime_ns)
+
+@functools.lru_cache(maxsize=4)
+def _parse_env_cached(env_path, mtime_ns):
+    """Single pass over the file; a dict value may span lines until its braces balance."""
     config = {}
+    dict_key = None; dict_lines = []; depth = 0; opened = False
     with open(env_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    for i, line in enumerate(lines):
-        line = line.strip()
-        if line.startswith('LOCAL_TRANSCRIPT_OUTPUT_DIR'):
-            config['LOCAL_TRANSCRIPT_OUTPUT_DIR'] = line.split('=', 1)[1].strip().strip('"')
-        elif line.startswith('DESTINATIONS_LEVEL_1'):
+        for line in f:
+            line = line.strip()
+            if dict_key is None:
+                if line.startswith('LOCAL_TRANSCRIPT_OUTPUT_DIR'):
+                    config['LOCAL_TRANSCRIPT_OUTPUT_DIR'] = line.split('=', 1)[1].strip().strip('"')
+                    continue
+                dict_key = next((key for key in DICT_KEYS if line.startswith(key)), None)
+                if dict_key is None:
+                    continue
+                line = line.split('=', 1)[1].strip()
             # Read dict block
-            dict_lines = [line.split('=', 1)[1].strip()]
-            j = i + 1
-            while not dict_lines[-1].endswith('}'):
-                dict_lines.append(lines[j].strip())
-                j += 1
-            config['DESTINATIONS_LEVEL_1'] = ast.literal_eval(''.join(dict_lines))
-        elif line.startswith('DESTINATIONS_LEVEL_2'):
-            dict_lines = [line.split('=', 1)[1].strip()]
-            j = i + 1
-            while not dict_lines[-1].endswith('}'):
-                dict_lines.append(lines[j].strip())
-                j += 1
-            config['DESTINATIONS_LEVEL_2'] = ast.literal_eval(''.join(dict_lines))
+            dict_lines.append(line)
+            depth += line.count('{') - line.count('}')
+            opened = opened or '{' in line # The '{' may be on the line after 'KEY ='
+            if opened and depth <= 0:
+                config[dict_key] = ast.literal_eval(''.join(dict_lines))
+                dict_key = None; dict_lines = []; depth = 0; opened = False
     return config
 
 def is_dash_separated_filename(line):
@@ -36,7 +49,7 @@ def is_dash_separated_filename(line):
     return (
         '-' in line and
         not line.startswith('https://') and
-        re.fullmatch(r'[a-zA-Z0-9\-]+', line)
+        FILENAME_RE.fullmatch(line)
     )
 
 def parse_input(input_path):
@@ -49,37 +62,86 @@ def parse_input(input_path):
                 filenames.append(line)
     return filenames
 
-def parse_filename(filename, level1_dict, level2_dict):
-    """Break down filename into subject, class type, and date using dicts."""
+def build_prefixes(level_dict):
+    """Bucket (key, key + '-') pairs by the prefix's first character, longest key first within each bucket.
+
+    Built once, then reused for every filename, so a lookup only compares against keys sharing its first character.
+    """
+    buckets = {}
+    for k in sorted(level_dict, key=len, reverse=True):
+        prefix = k + '-'
+        buckets.setdefault(prefix[0], []).append((k, prefix))
+    return {first: tuple(pairs) for first, pairs in buckets.items()}
+
+def match_prefix(text, prefixes):
+    """Return the longest key whose 'key-' prefix starts text, or None."""
+    for key, prefix in prefixes.get(text[:1], ()):
+        if text.startswith(prefix):
+            return key
+    return None
+
+def parse_filename(filename, level1_prefixes, level2_prefixes):
+    """Break down filename into subject, class type, and date using build_prefixes() of the level dicts."""
     # Try to match the longest level1 key at the start
-    level1_key = None
-    for k in sorted(level1_dict.keys(), key=lambda x: -len(x)):
-        if filename.startswith(k + '-'):
-            level1_key = k
-            break
+    level1_key = match_prefix(filename, level1_prefixes)
     if not level1_key:
         return None, None, None, 'Subject not found'
     rest = filename[len(level1_key)+1:]
-    # Next, match level2 key
-    level2_key = None
-    for k in level2_dict.keys():
-        if rest.startswith(k + '-'):
-            level2_key = k
-            break
+    # Next, match the longest level2 key
+    level2_key = match_prefix(rest, level2_prefixes)
     if not level2_key:
         return None, None, None, 'Class type not found'
     date_part = rest[len(level2_key)+1:]
     # Validate date: DD-MM-YY (allow single-digit D/M)
-    if not re.fullmatch(r'\d{1,2}-\d{1,2}-\d{2}', date_part):
+    if not DATE_RE.fullmatch(date_part):
         return None, None, None, 'Invalid date format'
     return level1_key, level2_key, date_part, None
 
+def list_dir_names(path, files_only=False):
+    """Return the set of entry names in path (one scandir instead of a stat per file), or an empty set if it doesn't exist."""
+    try:
+        with os.scandir(path) as entries:
+            return {e.name for e in entries if not files_only or e.is_file()}
+    except (FileNotFoundError, NotADirectoryError):
+        return set()
+
 def build_destination(level1_key, level2_key, date_part, level1_dict, level2_dict):
     """Build the destination directory path."""
     level1_dir = level1_dict[level1_key]
     level2_dir = level2_dict[level2_key]
     return os.path.join(level1_dir, level2_dir, date_part)
 
+def copy_one(item):
+    """Copy one planned transcript and create its empty .tex. Returns None on success, else an error message.
+
+    Both destination names are claimed with O_CREAT|O_EXCL before copying, so a file that appeared
+    since planning (or is claimed by another run at the same time) is never overwritten.
+    """
+    claimed = [] # Destination files created by this call, removed again if the copy doesn't complete
+    try:
+        os.makedirs(item['dest_dir'], exist_ok=True)
+        os.close(os.open(item['dest_txt'], os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644))
+        claimed.append(item['dest_txt'])
+        with open(item['dest_tex'], 'x', encoding='utf-8') as f:
+            pass
+        claimed.append(item['dest_tex'])
+        copy2(item['src_txt'], item['dest_txt']) # Fills the claimed .txt in place
+        return None
+    except FileExistsError:
+        _remove_claimed(claimed)
+        return 'Destination .txt or .tex file already exists'
+    except Exception as e:
+        _remove_claimed(claimed) # Don't leave an empty .txt/.tex that later runs would report as already delivered
+        return f'I/O error: {e}'
+
+def _remove_claimed(paths):
+    """Best-effort removal of the destination files copy_one() created before failing."""
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
 def main():
     parser = argparse.ArgumentParser(description="Distribute transcript files into structured folders.")
     parser.add_argument('input_file', type=str, help='Path to the input file listing transcript filenames.')
@@ -88,10 +150,16 @@ def main():
     parser.add_argument('--env', type=str, default='.env', help='Path to .env file.')
     args = parser.parse_args()
 
-    log_lines = []
+    # Lines go to the log file as they are logged, so it is complete even if the run is aborted or crashes
+    log_f = None
+    if args.log_file:
+        log_f = open(args.log_file, 'w', encoding='utf-8', buffering=1 << 14)
+        atexit.register(log_f.close)
     def log(msg):
         print(msg)
-        log_lines.append(msg)
+        if log_f:
+            log_f.write(msg)
+            log_f.write('\n')
 
     # Parse config
     try:
@@ -102,6 +170,13 @@ def main():
     except Exception as e:
         log(f'[FATAL] Failed to parse .env: {e}')
         sys.exit(1)
+    for name, level_dict in (('DESTINATIONS_LEVEL_1', level1_dict), ('DESTINATIONS_LEVEL_2', level2_dict)):
+        if not isinstance(level_dict, dict) or not level_dict:
+            log(f'[FATAL] {name} in {args.env} must be a non-empty dict.')
+            sys.exit(1)
+
+    level1_prefixes = build_prefixes(level1_dict)
+    level2_prefixes = build_prefixes(level2_dict)
 
     # Parse input
     filenames = parse_input(args.input_file)
@@ -110,8 +185,10 @@ def main():
     # Plan
     plan = []
     errors = []
+    existing_srcs = list_dir_names(transcript_dir, files_only=True)
+    dest_existing = {} # dest_dir -> names already in it, listed the first time the dir comes up
     for fname in filenames:
-        level1_key, level2_key, date_part, err = parse_filename(fname, level1_dict, level2_dict)
+        level1_key, level2_key, date_part, err = parse_filename(fname, level1_prefixes, level2_prefixes)
         if err:
             errors.append((fname, err))
             continue
@@ -120,11 +197,13 @@ def main():
         dest_txt = os.path.join(dest_dir, fname + '.txt')
         dest_tex = os.path.join(dest_dir, fname + '.tex')
         # Check source file
-        if not os.path.isfile(src_txt):
+        if fname + '.txt' not in existing_srcs:
             errors.append((fname, 'Source transcript file missing'))
             continue
-        # Check destination files
-        if os.path.exists(dest_txt) or os.path.exists(dest_tex):
+        # Check destination files (only to report likely skips in the plan; copy_one() makes the authoritative check)
+        if dest_dir not in dest_existing:
+            dest_existing[dest_dir] = list_dir_names(dest_dir)
+        if fname + '.txt' in dest_existing[dest_dir] or fname + '.tex' in dest_existing[dest_dir]:
             errors.append((fname, 'Destination .txt or .tex file already exists'))
             continue
         plan.append({
@@ -150,32 +229,23 @@ def main():
 
     if args.dry_run:
         log('\n[DRY-RUN] No files will be copied.')
-        if args.log_file:
-            with open(args.log_file, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(log_lines))
         return
 
     # Prompt for confirmation
     proceed = input('\nProceed with copying files? (y/N): ').strip().lower()
     if proceed != 'y':
         log('[ABORTED] No files were copied.')
-        if args.log_file:
-            with open(args.log_file, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(log_lines))
         return
 
-    # Execute plan
+    # Execute plan (copies are I/O bound, so they overlap in threads; results are logged in plan order)
     successes = []
-    for item in plan:
-        try:
-            os.makedirs(item['dest_dir'], exist_ok=True)
-            copy2(item['src_txt'], item['dest_txt'])
-            with open(item['dest_tex'], 'w', encoding='utf-8') as f:
-                pass
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_COPY_WORKERS, len(plan)))) as executor:
+        for item, err in zip(plan, executor.map(copy_one, plan)):
+            if err:
+                errors.append((item['filename'], err))
+                continue
             log(f"[OK] {item['filename']} copied to {item['dest_txt']} and empty .tex created.")
             successes.append(item['filename'])
-        except Exception as e:
-            errors.append((item['filename'], f'I/O error: {e}'))
 
     # Final summary
     log('\n[SUMMARY]')
@@ -186,9 +256,5 @@ def main():
     for fname, reason in errors:
         log(f'    {fname}: {reason}')
 
-    if args.log_file:
-        with open(args.log_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(log_lines))
-
 if __name__ == '__main__':
     main()
\ No newline at end of file